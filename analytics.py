@@ -0,0 +1,147 @@
+import csv
+import json
+import numpy as np
+from question_bank import ANSWER_PREFIX, split_question
+from string_pool import CompactQuestionBank
+
+# 题型与难度的编码顺序
+question_types = ['单选题', '多选题', '判断题', '简答题']
+difficulties = ['简单', '中等', '困难']
+type_codes = {qtype: code for code, qtype in enumerate(question_types)}
+difficulty_codes = {difficulty: code for code, difficulty in enumerate(difficulties)}
+content_length_percentiles = [50, 90, 99]
+
+# 将题库转换为列式数组，未识别的题型或难度编码为 -1
+def build_columns(questions):
+    if isinstance(questions, CompactQuestionBank):
+        return compact_columns(questions)
+    questions = questions if isinstance(questions, list) else list(questions)
+    count = len(questions)
+    return {
+        "type": np.fromiter((type_codes.get(q[0].strip("（").strip(), -1) for q in questions), dtype=np.int8, count=count),
+        "difficulty": np.fromiter((difficulty_codes.get(q[1], -1) for q in questions), dtype=np.int8, count=count),
+        "score": np.fromiter((int(q[2].replace('分', '')) for q in questions), dtype=np.int32, count=count),
+        "option_count": np.fromiter((len(split_question(q)[0]) for q in questions), dtype=np.int16, count=count),
+        "content_length": np.fromiter((len(q[3]) for q in questions), dtype=np.int32, count=count),
+    }
+
+# 紧凑题库直接由编码数组查表得到各列，不还原题目元组
+def compact_columns(bank):
+    def lookup(pool, codes, convert, dtype):
+        table = np.array([convert(value) for value in pool.strings], dtype=dtype)
+        return table[np.asarray(codes)] if len(table) else np.zeros(len(bank), dtype=dtype)
+
+    offsets = np.asarray(bank.option_offsets).astype(np.int64)
+    lengths = np.diff(offsets)
+    # 选项编码的最后一个是答案字段时不计入选项数（与 split_question 一致）
+    is_answer = np.array([option.startswith(ANSWER_PREFIX) for option in bank.options.strings], dtype=bool)
+    has_options = lengths > 0
+    answers = np.zeros(len(bank), dtype=bool)
+    if has_options.any():
+        answers[has_options] = is_answer[np.asarray(bank.option_codes)[offsets[1:][has_options] - 1]]
+    return {
+        "type": lookup(bank.types, bank.type_codes, lambda qtype: type_codes.get(qtype.strip("（").strip(), -1), np.int8),
+        "difficulty": lookup(bank.difficulties, bank.difficulty_codes, lambda difficulty: difficulty_codes.get(difficulty, -1), np.int8),
+        "score": lookup(bank.scores, bank.score_codes, lambda score: int(score.replace('分', '')), np.int32),
+        "option_count": (lengths - answers).astype(np.int16),
+        "content_length": np.fromiter((len(content) for content in bank.contents), dtype=np.int32, count=len(bank)),
+    }
+
+# 统计各取值出现的次数，返回 {取值: 次数}
+def value_counts(values):
+    keys, counts = np.unique(values, return_counts=True)
+    return {int(key): int(count) for key, count in zip(keys, counts)}
+
+# 可合并的部分统计，各项都是计数：分片题库由各分片分别计算，再用 merge_statistics 合并
+def partial_statistics(columns):
+    types = columns["type"]
+    levels = columns["difficulty"]
+    valid = (types >= 0) & (levels >= 0)
+    cells = types[valid].astype(np.int32) * len(difficulties) + levels[valid]
+    matrix = np.bincount(cells, minlength=len(question_types) * len(difficulties))
+    return {
+        "total": int(types.size),
+        "type_difficulty_counts": matrix.reshape(len(question_types), len(difficulties)).tolist(),
+        "score_histogram": value_counts(columns["score"]),
+        "option_count_distribution": value_counts(columns["option_count"]),
+        "content_length_counts": value_counts(columns["content_length"]),
+    }
+
+def merge_counts(counts_list):
+    merged = {}
+    for counts in counts_list:
+        for key, count in counts.items():
+            merged[key] = merged.get(key, 0) + count
+    return dict(sorted(merged.items()))
+
+# 由 {取值: 次数} 计算分位数，与对全部取值调用 np.percentile（线性插值）的结果相同
+def percentiles_from_counts(counts, percentiles):
+    if not counts:
+        return np.zeros(len(percentiles))
+    values = np.array(list(counts.keys()))
+    cumulative = np.cumsum(list(counts.values()))
+    results = []
+    for p in percentiles:
+        position = p / 100 * (cumulative[-1] - 1)
+        lower = values[np.searchsorted(cumulative, np.floor(position), side='right')]
+        upper = values[np.searchsorted(cumulative, np.ceil(position), side='right')]
+        fraction = position - np.floor(position)
+        # 与 numpy 的插值公式一致，保证结果逐位相同
+        if fraction >= 0.5:
+            results.append(upper - (upper - lower) * (1 - fraction))
+        else:
+            results.append(lower + (upper - lower) * fraction)
+    return np.array(results)
+
+# 合并部分统计，结果只包含内置类型，可直接导出为 JSON
+def merge_statistics(partials):
+    matrix = np.zeros((len(question_types), len(difficulties)), dtype=np.int64)
+    for partial in partials:
+        matrix += np.array(partial["type_difficulty_counts"], dtype=np.int64)
+    length_counts = merge_counts(partial["content_length_counts"] for partial in partials)
+    percentiles = percentiles_from_counts(length_counts, content_length_percentiles)
+
+    return {
+        "total": sum(partial["total"] for partial in partials),
+        "type_difficulty_counts": {
+            qtype: {difficulty: int(matrix[i, j]) for j, difficulty in enumerate(difficulties)}
+            for i, qtype in enumerate(question_types)
+        },
+        "score_histogram": merge_counts(partial["score_histogram"] for partial in partials),
+        "option_count_distribution": merge_counts(partial["option_count_distribution"] for partial in partials),
+        "content_length_percentiles": {
+            f"p{p}": float(value) for p, value in zip(content_length_percentiles, percentiles)
+        },
+    }
+
+# 计算题库统计信息
+def compute_statistics(columns):
+    return merge_statistics([partial_statistics(columns)])
+
+def export_statistics_json(statistics, filename):
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump(statistics, file, ensure_ascii=False, indent=4)
+
+# CSV 每行为 (统计项, 键, 值)
+def export_statistics_csv(statistics, filename):
+    with open(filename, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["statistic", "key", "value"])
+        writer.writerow(["total", "", statistics["total"]])
+        for qtype, row in statistics["type_difficulty_counts"].items():
+            for difficulty, count in row.items():
+                writer.writerow(["type_difficulty_counts", f"{qtype}/{difficulty}", count])
+        for name in ["score_histogram", "option_count_distribution", "content_length_percentiles"]:
+            for key, value in statistics[name].items():
+                writer.writerow([name, key, value])
+
+# 生成在界面中显示的统计文本
+def format_statistics(statistics):
+    text = f"题库总题量：{statistics['total']}\n"
+    text += "题型 × 难度：" + " / ".join(difficulties) + "\n"
+    for qtype, row in statistics["type_difficulty_counts"].items():
+        text += f"   {qtype}：" + " / ".join(str(count) for count in row.values()) + "\n"
+    text += "分值分布：" + "，".join(f"{score}分 {count}题" for score, count in statistics["score_histogram"].items()) + "\n"
+    text += "选项数分布：" + "，".join(f"{options}个选项 {count}题" for options, count in statistics["option_count_distribution"].items()) + "\n"
+    text += "题干长度分位数：" + "，".join(f"{name} {value:.0f}字" for name, value in statistics["content_length_percentiles"].items()) + "\n"
+    return text
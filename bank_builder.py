@@ -0,0 +1,227 @@
+import ast
+import bisect
+import hashlib
+import heapq
+import json
+import os
+import sys
+import tempfile
+from diagnostics import Diagnostics
+from main import Parser, lexical_analysis, read_word_category
+from semantic_analysis import SemanticAnalyzer
+from question_bank import WAL_SUFFIX, question_identity
+
+# 外部排序构建题库，内存占用不超过 memory_budget 字节。读入的题目先在内存中排序，超出预算时写入临时文件
+# （一个有序段），再多路归并所有有序段。共两轮：第一轮按题目身份（题型, 题干, 选项）排序去重，
+# 第二轮按 (题型, 难度, 题干哈希) 排序后写出题库和索引
+
+# 默认内存预算（字节）
+DEFAULT_MEMORY_BUDGET = 64 * 2**20
+# 每次归并同时打开的有序段数量及每个段的读缓冲区大小，有序段更多时分多轮归并
+MERGE_FAN_IN = 64
+MERGE_BUFFER_SIZE = 64 * 1024
+# 稀疏索引每隔多少道题记录一次位置
+INDEX_INTERVAL = 4096
+INDEX_SUFFIX = ".idx"
+
+def content_hash(question):
+    return hashlib.sha1(question[3].encode('utf-8')).hexdigest()
+
+# 题目身份与 question_id 相同，由题型、题干和选项决定（不截断哈希，千万级题库中也不会冲突）
+def identity_key(question):
+    return question[0], hashlib.sha1(question_identity(question).encode('utf-8')).hexdigest()
+
+# 题库中的排列顺序
+def sort_key(question):
+    return question[0], question[1] or "", content_hash(question)
+
+# 估算一道题及其排序键在内存中占用的字节数
+def sizeof_question(question, key):
+    return (sys.getsizeof(question) + sum(sys.getsizeof(field) for field in question)
+            + sys.getsizeof(key) + sum(sys.getsizeof(field) for field in key))
+
+# 排好序的题目中键相同的只保留最后一道（后导入的覆盖先导入的，与 QuestionBank.upsert 一致）
+def dedupe(keyed_questions):
+    previous = None
+    for key, question in keyed_questions:
+        if previous is not None and previous[0] != key:
+            yield previous
+        previous = (key, question)
+    if previous is not None:
+        yield previous
+
+# 有序段文件每行一道题（JSON 数组，读取比 ast.literal_eval 快），排序键读取时重新计算
+def write_run(filename, keyed_questions):
+    with open(filename, 'w', encoding='utf-8') as file:
+        for _, question in keyed_questions:
+            file.write(json.dumps(question, ensure_ascii=False) + '\n')
+
+def read_run(filename, key):
+    with open(filename, 'r', encoding='utf-8', buffering=MERGE_BUFFER_SIZE) as file:
+        for line in file:
+            question = tuple(json.loads(line))
+            yield key(question), question
+
+# 把题目按 key 分成若干有序段写入 directory，返回有序段文件列表
+def spill_runs(questions, directory, memory_budget, key, name):
+    runs = []
+    buffer = []
+    buffer_bytes = 0
+
+    def spill():
+        buffer.sort(key=lambda item: item[0])
+        filename = os.path.join(directory, f"{name}_run_{len(runs)}.jsonl")
+        write_run(filename, dedupe(buffer))
+        runs.append(filename)
+        buffer.clear()
+
+    for question in questions:
+        question_key = key(question)
+        buffer.append((question_key, question))
+        buffer_bytes += sizeof_question(question, question_key)
+        if buffer_bytes >= memory_budget:
+            spill()
+            buffer_bytes = 0
+    if buffer or not runs:
+        spill()
+    return runs
+
+def merge_runs(runs, key):
+    return dedupe(heapq.merge(*(read_run(run, key) for run in runs), key=lambda item: item[0]))
+
+# 有序段多于 MERGE_FAN_IN 个时，按顺序每 MERGE_FAN_IN 个归并为一个新的有序段，
+# 直到剩余的有序段可以一次归并；按顺序分组保证键相同时后导入的题目仍排在后面
+def reduce_runs(runs, directory, key, name):
+    generation = 0
+    while len(runs) > MERGE_FAN_IN:
+        merged = []
+        for start in range(0, len(runs), MERGE_FAN_IN):
+            group = runs[start:start + MERGE_FAN_IN]
+            filename = os.path.join(directory, f"{name}_merge_{generation}_{len(merged)}.jsonl")
+            write_run(filename, merge_runs(group, key))
+            for run in group:
+                os.remove(run)
+            merged.append(filename)
+        runs = merged
+        generation += 1
+    return runs
+
+# 外部排序：返回按 key 排序、键相同只保留最后一个的 (键, 题目) 迭代器，以及第一轮的有序段数
+def external_sort(questions, directory, memory_budget, key, name):
+    runs = spill_runs(questions, directory, memory_budget, key, name)
+    return merge_runs(reduce_runs(runs, directory, key, name), key), len(runs)
+
+# 写出题库（与 QuestionBank 相同的格式）和索引。索引记录每个 (题型, 难度) 在题库文件中的
+# 起始位置和题目数，以及每隔 INDEX_INTERVAL 道题的排序键和位置，用于按题目查找
+def write_bank(keyed_questions, filename):
+    sections = []
+    sparse = []
+    offset = 0
+    count = 0
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, 'wb') as file:
+        for key, question in keyed_questions:
+            if not sections or (sections[-1][0], sections[-1][1]) != key[:2]:
+                sections.append([key[0], key[1], offset, 0])
+            sections[-1][3] += 1
+            if count % INDEX_INTERVAL == 0:
+                sparse.append([*key, offset])
+            line = (str(question) + '\n').encode('utf-8')
+            file.write(line)
+            offset += len(line)
+            count += 1
+    os.replace(temp_filename, filename)
+    index = {"count": count, "sections": sections, "sparse": sparse}
+    with open(filename + INDEX_SUFFIX, 'w', encoding='utf-8') as file:
+        json.dump(index, file, ensure_ascii=False)
+    return index
+
+# 从可迭代的题目构建题库，questions 可以是生成器，整个过程只在内存中保留一个有序段；
+# 题型、题干、选项相同的题目只保留最后一道，与 QuestionBank.load() 读取的结果一致
+def build_bank(questions, filename, memory_budget=DEFAULT_MEMORY_BUDGET):
+    directory = os.path.dirname(filename) or "."
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    with tempfile.TemporaryDirectory(dir=directory) as temp_directory:
+        unique, identity_runs = external_sort(questions, temp_directory, memory_budget, identity_key, "identity")
+        ordered, order_runs = external_sort((question for _, question in unique), temp_directory,
+                                            memory_budget, sort_key, "order")
+        index = write_bank(ordered, filename)
+    index["runs"] = identity_runs + order_runs
+    return index
+
+def load_index(filename):
+    with open(filename + INDEX_SUFFIX, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def parse_bank_line(line):
+    return tuple(ast.literal_eval(line.decode('utf-8').strip()))
+
+# 读取某个题型、难度的全部题目
+def iter_section(filename, index, qtype, difficulty):
+    for section_type, section_difficulty, offset, count in index["sections"]:
+        if section_type == qtype and section_difficulty == (difficulty or ""):
+            with open(filename, 'rb') as file:
+                file.seek(offset)
+                for _ in range(count):
+                    yield parse_bank_line(file.readline())
+
+# 按排序键查找题目，只读取一个索引间隔内的题目；题干相同的题目返回排在最前的一道，找不到时返回 None
+def find_question(filename, index, qtype, difficulty, content):
+    key = sort_key((qtype, difficulty, None, content))
+    position = bisect.bisect_right([tuple(entry[:3]) for entry in index["sparse"]], key) - 1
+    if position < 0:
+        return None
+    with open(filename, 'rb') as file:
+        file.seek(index["sparse"][position][3])
+        for _ in range(INDEX_INTERVAL):
+            line = file.readline()
+            if not line:
+                break
+            question = parse_bank_line(line)
+            question_key = sort_key(question)
+            if question_key == key:
+                return question
+            if question_key > key:
+                break
+    return None
+
+# 列出目录下的全部试卷源文件
+def find_sources(path):
+    if os.path.isfile(path):
+        return [path]
+    sources = []
+    for root, _, files in os.walk(path):
+        sources += [os.path.join(root, name) for name in sorted(files) if name.endswith('.txt')]
+    return sorted(sources)
+
+# 依次对每个源文件运行词法、语法、语义分析，只输出没有任何错误的试卷中的题目
+def validated_questions(sources, word_category, rejected=None):
+    for source in sources:
+        diagnostics = Diagnostics()
+        _, tokens, errors = lexical_analysis(source, diagnostics)
+        parser = Parser(tokens, word_category, os.devnull, diagnostics=diagnostics)
+        parser.parse()
+        sem_analyzer = SemanticAnalyzer([(token[0], token[1], line) for line, token in enumerate(tokens, start=1)], word_category, diagnostics)
+        sem_analyzer.analyze_auto()
+        errors = errors + parser.errors + sem_analyzer.errors
+        if errors:
+            if rejected is not None:
+                rejected.append((source, errors))
+            continue
+        yield from sem_analyzer.questions
+
+if __name__ == "__main__":
+    source_path = sys.argv[1] if len(sys.argv) > 1 else "./src"
+    bank_filename = sys.argv[2] if len(sys.argv) > 2 else "./output/QuestionBank.txt"
+    memory_budget = int(sys.argv[3]) * 2**20 if len(sys.argv) > 3 else DEFAULT_MEMORY_BUDGET
+    sources = find_sources(source_path)
+    rejected = []
+    index = build_bank(validated_questions(sources, read_word_category('word_category.json'), rejected),
+                       bank_filename, memory_budget)
+    for source, errors in rejected:
+        print(f"跳过 {source}：{len(errors)} 个错误，第一个错误：{errors[0]}")
+    if os.path.exists(bank_filename + WAL_SUFFIX):
+        print(f"注意：{bank_filename + WAL_SUFFIX} 中尚未合并的记录会在读取题库时覆盖新构建的题库")
+    print(f"已从 {len(sources) - len(rejected)} 个试卷源文件构建题库 {bank_filename}：{index['count']} 道题，"
+          f"{index['runs']} 个有序段，{len(index['sections'])} 个（题型, 难度）分区，索引 {bank_filename + INDEX_SUFFIX}")
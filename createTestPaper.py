@@ -1,63 +1,156 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import random
-import ast
+import copy
 from fpdf import FPDF
 from docx import Document, shared
+from lxml import etree
 import os
+from question_bank import QuestionBank
+from sharded_bank import ShardedQuestionBank
+from fragment_cache import FragmentCache, fragment_id, sizeof_lines
+from exam_variants import create_variant_papers
+from exporters import AnswerKeyFragmentWriter, AnswerKeyWriter, FragmentWriter, HtmlWriter, JsonWriter, MarkdownWriter, TextWriter, export_paper
+from sampler import UsageStats, paper_seed
+from analytics import export_statistics_csv, export_statistics_json, format_statistics
 
-# 读取题库数据
+# 读取题库数据（包含尚未合并的 WAL 记录）为紧凑题库；file_path 为目录时按分片题库打开
 def read_questions(file_path):
-    questions = []
-    with open(file_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            if line.strip():  # 跳过空行
-                try:
-                    question = ast.literal_eval(line.strip())
-                    questions.append(question)
-                except (SyntaxError, ValueError) as e:
-                    print(f"Error parsing line: {line}. Error: {e}")
-    return questions
-
-# 统计每种题型的题量
+    if os.path.isdir(file_path):
+        return ShardedQuestionBank(file_path)
+    return QuestionBank(file_path).load_compact()
+
+# 统计每种题型的题量；紧凑题库和分片题库都按题型计数，不遍历题目
 def count_questions(questions):
     counts = {'单选题': 0, '多选题': 0, '判断题': 0, '简答题': 0}
-    for question in questions:
-        qtype = question[0].strip("（").strip()  # 移除可能存在的括号
+    for qtype, count in questions.count_by_type().items():
+        qtype = qtype.strip("（").strip()  # 移除可能存在的括号
         if qtype in counts:
-            counts[qtype] += 1
+            counts[qtype] += count
         else:
             print(f"Unrecognized question type: {qtype}")
     return counts
 
-# 创建PDF文档
-def create_pdf(exam_name, content):
-    pdf = FPDF()
-    pdf.add_page()
-    font_path = os.path.join(os.path.dirname(__file__), './src/SimSun.ttf')
-    pdf.add_font('SimSun', '', font_path, uni=True)
-    pdf.set_font('SimSun', '', 16)
-    pdf.cell(0, 10, exam_name, 0, 1, 'C')
-    pdf.set_font('SimSun', '', 12)
-    pdf.multi_cell(0, 10, content)
-    if not os.path.exists("./output"):
-        os.makedirs("./output")
-    pdf.output(f"./output/{exam_name}.pdf")
-
-# 创建Word文档
-def create_word(exam_name, content):
-    doc = Document()
-    doc.add_heading(exam_name, level=1)
-    for line in content.split('\n'):
-        if line.strip():
+# 排版过的题目片段缓存，同一批试卷中重复出现的题目只需排版一次
+fragment_cache = FragmentCache()
+
+# 按可用宽度逐字断行，首行可用宽度为 first_width，其余行为 width
+def shape_lines(pdf, text, width, first_width):
+    lines = []
+    current = ""
+    current_width = 0
+    limit = first_width
+    for char in text:
+        char_width = pdf.get_string_width(char)
+        if current and current_width + char_width > limit:
+            lines.append(current)
+            current = ""
+            current_width = 0
+            limit = width
+        current += char
+        current_width += char_width
+    lines.append(current)
+    return lines
+
+def shape_fragment(pdf, lines, width, first_width):
+    shaped = shape_lines(pdf, lines[0], width, first_width)
+    for line in lines[1:]:
+        shaped += shape_lines(pdf, line, width, width)
+    return shaped
+
+# PDF 输出器：按片段排版，每道题的排版结果按片段内容缓存
+class PdfWriter(FragmentWriter):
+    def __init__(self, exam_name, cache=fragment_cache):
+        self.exam_name = exam_name
+        self.cache = cache
+        self.pdf = FPDF()
+        self.pdf.add_page()
+        font_path = os.path.join(os.path.dirname(__file__), './src/SimSun.ttf')
+        self.pdf.add_font('SimSun', '', font_path, uni=True)
+        self.pdf.set_font('SimSun', '', 16)
+        self.pdf.cell(0, 10, exam_name, 0, 1, 'C')
+        self.pdf.set_font('SimSun', '', 12)
+
+        # 题号单独占一个固定宽度的单元格，题目其余部分的排版结果与题号无关，可以复用
+        self.width = self.pdf.w - self.pdf.l_margin - self.pdf.r_margin - 2 * self.pdf.c_margin
+        self.prefix_width = self.pdf.get_string_width("000、") + 2 * self.pdf.c_margin
+
+    def write_fragment(self, prefix, lines):
+        first_width = self.width - self.prefix_width if prefix else self.width
+        shaped = self.cache.get_or_create((fragment_id(lines), 'SimSun', 12, bool(prefix)),
+                                          lambda: shape_fragment(self.pdf, lines, self.width, first_width), sizeof_lines)
+        for index, line in enumerate(shaped):
+            if index == 0 and prefix:
+                self.pdf.cell(self.prefix_width, 10, prefix)
+            self.pdf.cell(0, 10, line, ln=1)
+
+    def paper_end(self):
+        if not os.path.exists("./output"):
+            os.makedirs("./output")
+        self.pdf.output(f"./output/{self.exam_name}.pdf")
+
+# 答案的 PDF，与试卷在同一次遍历中输出
+class AnswerKeyPdfWriter(AnswerKeyFragmentWriter, PdfWriter):
+    pass
+
+# 向文档中添加一个片段的段落，题号作为第一个文本块单独保存，便于复用时替换
+def add_fragment_paragraphs(doc, prefix, lines):
+    paragraphs = []
+    for index, line in enumerate(lines):
+        if index == 0 and prefix:
+            p = doc.add_paragraph()
+            p.add_run(prefix)
+            p.add_run(line)
+        elif line.strip():
             p = doc.add_paragraph(line)
-            if line.startswith("第") and "部分" in line:
-                p.bold = True
-            elif line.startswith("   "):
-                p.left_indent = shared.Inches(0.5)
-    if not os.path.exists("./output"):
-        os.makedirs("./output")
-    doc.save(f"./output/{exam_name}.docx")
+        else:
+            continue
+        if line.startswith("第") and "部分" in line:
+            p.bold = True
+        elif line.startswith("   "):
+            p.left_indent = shared.Inches(0.5)
+        paragraphs.append(p)
+    return paragraphs
+
+def sizeof_elements(elements):
+    return sum(len(etree.tostring(element)) for element in elements)
+
+# Word 输出器：每个片段的段落 XML 按片段内容缓存
+class DocxWriter(FragmentWriter):
+    def __init__(self, exam_name, cache=fragment_cache):
+        self.exam_name = exam_name
+        self.cache = cache
+        self.doc = Document()
+        self.doc.add_heading(exam_name, level=1)
+        self.body = self.doc.element.body
+        self.font = self.doc.styles['Normal'].font
+
+    def write_fragment(self, prefix, lines):
+        key = (fragment_id(lines), 'docx', self.font.name, self.font.size, bool(prefix))
+        elements = self.cache.get(key)
+        if elements is None:
+            paragraphs = add_fragment_paragraphs(self.doc, prefix, lines)
+            elements = [copy.deepcopy(p._p) for p in paragraphs]
+            self.cache.put(key, elements, sizeof_elements(elements))
+            return
+        # 命中缓存时直接复制段落 XML，只替换题号
+        for index, element in enumerate(elements):
+            element = copy.deepcopy(element)
+            if index == 0 and prefix:
+                element.r_lst[0].text = prefix
+            if self.body.sectPr is not None:
+                self.body.sectPr.addprevious(element)
+            else:
+                self.body.append(element)
+
+    def paper_end(self):
+        if not os.path.exists("./output"):
+            os.makedirs("./output")
+        self.doc.save(f"./output/{self.exam_name}.docx")
+
+# 答案的 Word 文档
+class AnswerKeyDocxWriter(AnswerKeyFragmentWriter, DocxWriter):
+    pass
 
 # 创建GUI
 class ExamGenerator(tk.Tk):
@@ -66,6 +159,7 @@ class ExamGenerator(tk.Tk):
         self.title("试卷生成器")
         self.questions = questions
         self.counts = count_questions(questions)
+        self.usage = UsageStats()
 
         # 试卷名称输入
         self.exam_name_label = tk.Label(self, text="试卷名称")
@@ -85,9 +179,28 @@ class ExamGenerator(tk.Tk):
             self.selections[qtype] = combobox
             row += 1
 
+        # 试卷套数，多于一套时每套试卷打乱选项顺序
+        self.variant_label = tk.Label(self, text="试卷套数")
+        self.variant_label.grid(row=row, column=0, padx=10, pady=10)
+        self.variant_combobox = ttk.Combobox(self, values=list(range(1, 11)))
+        self.variant_combobox.current(0)
+        self.variant_combobox.grid(row=row, column=1, padx=10, pady=10)
+        row += 1
+
+        # 随机种子，留空时由试卷名称生成
+        self.seed_label = tk.Label(self, text="随机种子（可选）")
+        self.seed_label.grid(row=row, column=0, padx=10, pady=10)
+        self.seed_entry = tk.Entry(self)
+        self.seed_entry.grid(row=row, column=1, padx=10, pady=10)
+        row += 1
+
         # 生成试卷按钮
         self.generate_button = tk.Button(self, text="生成试卷", command=self.generate_exam)
-        self.generate_button.grid(row=row, column=0, columnspan=2, padx=10, pady=10)
+        self.generate_button.grid(row=row, column=0, padx=10, pady=10)
+
+        # 题库统计按钮
+        self.statistics_button = tk.Button(self, text="题库统计", command=self.show_statistics)
+        self.statistics_button.grid(row=row, column=1, padx=10, pady=10)
 
         # 试卷显示区域
         self.exam_text = tk.Text(self, width=80, height=20)
@@ -100,36 +213,78 @@ class ExamGenerator(tk.Tk):
             return
 
         selected_counts = {qtype: int(combobox.get()) for qtype, combobox in self.selections.items()}
-        exam_content = self.create_exam_content(exam_name, selected_counts)
+        variant_count = int(self.variant_combobox.get())
+        seed_text = self.seed_entry.get().strip()
+        if not seed_text:
+            seed = paper_seed(exam_name)
+        elif seed_text.lstrip('-').isdigit():
+            seed = int(seed_text)
+        else:
+            messagebox.showerror("错误", "随机种子必须是整数")
+            return
+        # 同名、同种子的试卷已经生成过时重新生成同一份试卷，不再计入使用记录
+        selected_questions = self.replay_paper(exam_name, seed, selected_counts)
+        if selected_questions is None:
+            selected_questions = self.select_questions(selected_counts, seed)
+            self.record_usage(exam_name, seed, selected_questions)
+        papers = create_variant_papers(exam_name, selected_questions, variant_count, shuffle=variant_count > 1, seed=seed)
+        if not os.path.exists("./output"):
+            os.makedirs("./output")
+
+        # 每套试卷只遍历一次，同时输出试卷和答案：试卷为 PDF、Word、JSON、Markdown 和 HTML，答案为 PDF 和 Word
+        paper_names = []
+        for index, (title, sections) in enumerate(papers, start=1):
+            paper_name = exam_name if variant_count == 1 else f"{exam_name}_{index}"
+            paper, key = TextWriter(), AnswerKeyWriter()
+            export_paper(title, sections, [
+                paper, key,
+                PdfWriter(paper_name), DocxWriter(paper_name),
+                AnswerKeyPdfWriter(f"{paper_name}_答案"), AnswerKeyDocxWriter(f"{paper_name}_答案"),
+                JsonWriter(f"./output/{paper_name}.json"),
+                MarkdownWriter(f"./output/{paper_name}.md"),
+                HtmlWriter(f"./output/{paper_name}.html")
+            ])
+            if index == 1:
+                self.exam_text.delete(1.0, tk.END)
+                self.exam_text.insert(tk.END, paper.content + key.content)
+            paper_names.append(paper_name)
+        messagebox.showinfo("成功", "试卷及答案已生成为PDF、Word、JSON、Markdown和HTML文件：" + ", ".join(f"./output/{name}.pdf, ./output/{name}.docx" for name in paper_names))
+
+    def show_statistics(self):
+        statistics = self.questions.statistics()
         self.exam_text.delete(1.0, tk.END)
-        self.exam_text.insert(tk.END, exam_content)
-
-        # 创建PDF和Word文件
-        create_pdf(exam_name, exam_content)
-        create_word(exam_name, exam_content)
-        messagebox.showinfo("成功", f"试卷已生成为PDF和Word文件：./output/{exam_name}.pdf, ./output/{exam_name}.docx")
-
-    def create_exam_content(self, exam_name, selected_counts):
-        exam_content = f"{exam_name}\n"
-        exam_content += "=============================================================\n"
-
-        question_pool = {qtype: [q for q in self.questions if q[0].strip("（").strip() == qtype] for qtype in selected_counts.keys()}
-        section_number = 1
-
-        for qtype, count in selected_counts.items():
-            if count == 0:
-                continue
-            total_score = sum(int(q[2].replace('分', '')) for q in question_pool[qtype][:count])
-            exam_content += f"第{section_number}部分 {qtype}（共{total_score}分，{count}题）\n"
-            section_number += 1
-            selected_questions = random.sample(question_pool[qtype], count)
-            for idx, q in enumerate(selected_questions, start=1):
-                exam_content += f"{idx}、（{q[1]}）{q[3]}（{q[2]}）\n"
-                options = q[4:]
-                for option in options:
-                    exam_content += f"   {option}\n"
-            exam_content += "\n"
-        return exam_content
+        self.exam_text.insert(tk.END, format_statistics(statistics))
+
+        if not os.path.exists("./output"):
+            os.makedirs("./output")
+        export_statistics_json(statistics, "./output/statistics.json")
+        export_statistics_csv(statistics, "./output/statistics.csv")
+
+    # 按题型抽取题目，返回 [(题型, [题目, ...]), ...]。同一种子在同样的使用记录下结果相同，
+    # 近期用过、用得多的题目被抽中的概率更低
+    def select_questions(self, selected_counts, seed=None):
+        rng = random.Random(seed)
+        return [(qtype, self.questions.sample(qtype, count, self.usage, rng)) for qtype, count in selected_counts.items() if count > 0]
+
+    def record_usage(self, exam_name, seed, selected_questions):
+        qids = self.usage.record(exam_name, seed, [q for _, questions in selected_questions for q in questions])
+        self.usage.save()
+        self.questions.record_usage(qids, self.usage)
+
+    # 按使用记录中保存的题目还原同名、同种子的试卷；题目已不在题库中或各题型题量不同时返回 None，重新抽题
+    def replay_paper(self, exam_name, seed, selected_counts):
+        paper = self.usage.papers.get(exam_name)
+        if paper is None or paper["seed"] != seed:
+            return None
+        found = self.questions.find_questions(paper["questions"], self.usage)
+        if len(found) != len(set(paper["questions"])):
+            return None
+        by_type = {}
+        for qid in paper["questions"]:
+            by_type.setdefault(found[qid][0].strip("（").strip(), []).append(found[qid])
+        if {qtype: len(questions) for qtype, questions in by_type.items()} != {qtype: count for qtype, count in selected_counts.items() if count > 0}:
+            return None
+        return [(qtype, by_type[qtype]) for qtype, count in selected_counts.items() if count > 0]
 
 if __name__ == "__main__":
     file_path = "./output/QuestionBank.txt"  # 请确保文件路径正确
@@ -0,0 +1,107 @@
+import array
+import json
+import os
+
+# 每个 token 在源文件中的位置，按 (文件编号, 行号, 起始列, 结束列) 四个整数一组
+# 紧凑地存放在一个数组中，第 i 组对应第 i 个 token；列号从 1 开始，结束列不包含在内
+class SourceSpans:
+    def __init__(self):
+        self.files = []
+        self.file_ids = {}
+        self.data = array.array('I')
+
+    def add_file(self, filename):
+        if filename not in self.file_ids:
+            self.file_ids[filename] = len(self.files)
+            self.files.append(filename)
+        return self.file_ids[filename]
+
+    def add(self, file_id, line, start, end):
+        self.data.extend((file_id, line, start, end))
+
+    def __len__(self):
+        return len(self.data) // 4
+
+    # 返回 (文件名, 行号, 起始列, 结束列)，超出范围（如结束符 $）时返回 None
+    def get(self, index):
+        if index is None or not 0 <= index < len(self):
+            return None
+        file_id, line, start, end = self.data[index * 4:index * 4 + 4]
+        return self.files[file_id], line, start, end
+
+    # 与 tokens.txt 配套保存：第一行为文件列表（JSON），其后为位置数组的二进制内容
+    def save(self, filename):
+        with open(filename, 'wb') as file:
+            file.write(json.dumps(self.files, ensure_ascii=False).encode('utf-8') + b'\n')
+            file.write(self.data.tobytes())
+
+    # 读取配套的位置文件；文件不存在或与 token 数量不一致（已过期）时返回 None
+    @classmethod
+    def load(cls, filename, token_count=None):
+        if not os.path.exists(filename):
+            return None
+        spans = cls()
+        with open(filename, 'rb') as file:
+            for name in json.loads(file.readline().decode('utf-8')):
+                spans.add_file(name)
+            spans.data.frombytes(file.read())
+        if token_count is not None and len(spans) != token_count:
+            return None
+        return spans
+
+# 根据正则匹配结果计算某个分组的位置，column 为去掉行首空白后第一个字符所在的列
+def match_span(file_id, line_number, column, match, group, base=0):
+    return file_id, line_number, column + base + match.start(group), column + base + match.end(group)
+
+# 各阶段的诊断信息。location 为 token 编号（通过 spans 换算为源文件位置）、
+# 直接给出的 (文件编号, 行号, 起始列, 结束列)，或 None（没有对应位置）
+class Diagnostics:
+    def __init__(self, spans=None):
+        self.spans = spans if spans is not None else SourceSpans()
+        self.entries = []
+
+    def add(self, stage, message, location=None):
+        self.entries.append((stage, message, location))
+
+    def line_of(self, token_index):
+        span = self.spans.get(token_index)
+        return span[1] if span else None
+
+    def resolve(self, location):
+        if isinstance(location, tuple):
+            file_id, line, start, end = location
+            return self.spans.files[file_id], line, start, end
+        return self.spans.get(location)
+
+    def to_json(self):
+        results = []
+        for stage, message, location in self.entries:
+            span = self.resolve(location)
+            result = {"stage": stage, "message": message}
+            if span:
+                result.update({"file": span[0], "line": span[1], "start_column": span[2], "end_column": span[3]})
+            results.append(result)
+        return results
+
+    # SARIF 2.1.0 格式，可直接被编辑器和 CI 工具读取并定位到源文件中的行
+    def to_sarif(self):
+        results = []
+        for stage, message, location in self.entries:
+            result = {"ruleId": stage, "level": "error", "message": {"text": message}}
+            span = self.resolve(location)
+            if span:
+                result["locations"] = [{
+                    "physicalLocation": {
+                        "artifactLocation": {"uri": span[0]},
+                        "region": {"startLine": span[1], "startColumn": span[2], "endColumn": span[3]}
+                    }
+                }]
+            results.append(result)
+        return {
+            "version": "2.1.0",
+            "runs": [{"tool": {"driver": {"name": "compiler_autoCreateTestPaper"}}, "results": results}]
+        }
+
+    def save(self, filename, sarif=True):
+        with open(filename, 'w', encoding='utf-8') as file:
+            json.dump(self.to_sarif() if sarif else self.to_json(), file, ensure_ascii=False, indent=4)
@@ -0,0 +1,54 @@
+import random
+from question_bank import split_question
+
+# 打乱选项顺序并按 A、B、C... 重新编号（与语法分析中选项必须按字母顺序出现的规则一致），
+# 同时把答案中的字母映射到新的编号，返回 (新选项列表, 新答案)。
+# “以上答案均正确”这类引用其他选项的选项保持原位置不动
+def shuffle_options(options, answer, rng):
+    labels = [option.split("、", 1)[0] for option in options]
+    texts = [option.split("、", 1)[1] if "、" in option else option for option in options]
+    movable = [index for index, text in enumerate(texts) if not text.startswith("以上")]
+    shuffled = movable[:]
+    rng.shuffle(shuffled)
+    order = list(range(len(options)))
+    for position, index in zip(movable, shuffled):
+        order[position] = index
+
+    new_options = []
+    label_map = {}
+    for new_index, old_index in enumerate(order):
+        new_label = chr(ord("A") + new_index)
+        new_options.append(f"{new_label}、{texts[old_index]}")
+        label_map[labels[old_index]] = new_label
+
+    if answer is None:
+        return new_options, None
+    letters = [letter for letter in answer.upper() if letter in label_map]
+    if not letters:
+        return new_options, answer
+    return new_options, "".join(sorted(label_map[letter] for letter in letters))
+
+# 一次遍历已抽取的题目，同时生成多套试卷的结构：各套试卷题目相同，只打乱选项顺序。
+# selected_questions 为 [(题型, [题目, ...]), ...]，
+# 返回 [(试卷标题, [(题型, [(题目, 选项列表, 答案), ...]), ...]), ...]，可直接交给 exporters.export_paper
+def create_variant_papers(exam_name, selected_questions, variant_count, shuffle=True, seed=None):
+    rng = random.Random(seed)
+    if variant_count == 1:
+        titles = [exam_name]
+    else:
+        titles = [f"{exam_name}（第{index}套）" for index in range(1, variant_count + 1)]
+    papers = [(title, []) for title in titles]
+
+    for qtype, questions in selected_questions:
+        sections = [[] for _ in papers]
+        for q in questions:
+            options, answer = split_question(q)
+            for section in sections:
+                if shuffle and options:
+                    section.append((q, *shuffle_options(options, answer, rng)))
+                else:
+                    section.append((q, options, answer))
+        for (_, paper_sections), section in zip(papers, sections):
+            paper_sections.append((qtype, section))
+
+    return papers
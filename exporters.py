@@ -0,0 +1,171 @@
+import html
+import json
+
+# 试卷导出流水线：一次遍历试卷，把每个事件同时分发给多个格式的输出器。
+# sections 为 [(题型, [(题目, 选项列表, 答案), ...]), ...]，选项已按本套试卷的顺序编号
+def export_paper(title, sections, writers):
+    for writer in writers:
+        writer.paper_start(title)
+    for number, (qtype, questions) in enumerate(sections, start=1):
+        total_score = sum(int(question[2].replace('分', '')) for question, _, _ in questions)
+        for writer in writers:
+            writer.section_start(number, qtype, total_score, len(questions))
+        for index, (question, options, answer) in enumerate(questions, start=1):
+            for writer in writers:
+                writer.question(index, question, options, answer)
+        for writer in writers:
+            writer.section_end()
+    for writer in writers:
+        writer.paper_end()
+
+# 输出器基类，子类只需实现关心的事件
+class ExamWriter:
+    def paper_start(self, title):
+        pass
+
+    def section_start(self, number, qtype, total_score, count):
+        pass
+
+    def question(self, number, question, options, answer):
+        pass
+
+    def section_end(self):
+        pass
+
+    def paper_end(self):
+        pass
+
+# 把事件转换为纯文本试卷的片段 (题号前缀, 各行)，供文本、PDF、Word 输出器共用
+class FragmentWriter(ExamWriter):
+    def write_fragment(self, prefix, lines):
+        raise NotImplementedError
+
+    def paper_start(self, title):
+        self.write_fragment("", [title])
+        self.write_fragment("", ["============================================================="])
+
+    def section_start(self, number, qtype, total_score, count):
+        self.write_fragment("", [f"第{number}部分 {qtype}（共{total_score}分，{count}题）"])
+
+    def question(self, number, question, options, answer):
+        self.write_fragment(f"{number}、", [f"（{question[1]}）{question[3]}（{question[2]}）"] + [f"   {option}" for option in options])
+
+    def section_end(self):
+        self.write_fragment("", [""])
+
+# 纯文本试卷，内容用于界面显示
+class TextWriter(FragmentWriter):
+    def __init__(self):
+        self.parts = []
+
+    def write_fragment(self, prefix, lines):
+        self.parts.append(prefix + "\n".join(lines) + "\n")
+
+    @property
+    def content(self):
+        return "".join(self.parts)
+
+# 把事件转换为答案的片段：每道题只有题号和答案。与输出器类组合使用（放在继承列表的前面），
+# 同一个输出器类即可输出答案，例如 AnswerKeyWriter
+class AnswerKeyFragmentWriter(FragmentWriter):
+    def paper_start(self, title):
+        self.write_fragment("", [f"{title} 答案"])
+        self.write_fragment("", ["============================================================="])
+
+    def question(self, number, question, options, answer):
+        self.write_fragment(f"{number}、", [answer if answer else '（无）'])
+
+# 纯文本答案
+class AnswerKeyWriter(AnswerKeyFragmentWriter, TextWriter):
+    pass
+
+# 以下输出器边遍历边写文件，不在内存中保存整份试卷
+
+# JSON 格式（供 LMS 导入），包含答案
+class JsonWriter(ExamWriter):
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = None
+        self.first_section = True
+        self.first_question = True
+
+    def paper_start(self, title):
+        self.file = open(self.filename, 'w', encoding='utf-8')
+        self.file.write('{"title": ' + json.dumps(title, ensure_ascii=False) + ', "sections": [')
+
+    def section_start(self, number, qtype, total_score, count):
+        if not self.first_section:
+            self.file.write(', ')
+        self.first_section = False
+        self.first_question = True
+        header = json.dumps({"number": number, "type": qtype, "total_score": total_score, "count": count}, ensure_ascii=False)
+        self.file.write(header[:-1] + ', "questions": [')
+
+    def question(self, number, question, options, answer):
+        if not self.first_question:
+            self.file.write(', ')
+        self.first_question = False
+        self.file.write(json.dumps({
+            "number": number,
+            "difficulty": question[1],
+            "score": int(question[2].replace('分', '')),
+            "content": question[3],
+            "options": options,
+            "answer": answer
+        }, ensure_ascii=False))
+
+    def section_end(self):
+        self.file.write(']}')
+
+    def paper_end(self):
+        self.file.write(']}\n')
+        self.file.close()
+
+class MarkdownWriter(ExamWriter):
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = None
+
+    def paper_start(self, title):
+        self.file = open(self.filename, 'w', encoding='utf-8')
+        self.file.write(f"# {title}\n\n")
+
+    def section_start(self, number, qtype, total_score, count):
+        self.file.write(f"## 第{number}部分 {qtype}（共{total_score}分，{count}题）\n\n")
+
+    def question(self, number, question, options, answer):
+        self.file.write(f"{number}. （{question[1]}）{question[3]}（{question[2]}）\n")
+        for option in options:
+            self.file.write(f"    - {option}\n")
+
+    def section_end(self):
+        self.file.write("\n")
+
+    def paper_end(self):
+        self.file.close()
+
+class HtmlWriter(ExamWriter):
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = None
+
+    def paper_start(self, title):
+        self.file = open(self.filename, 'w', encoding='utf-8')
+        self.file.write(f'<!DOCTYPE html>\n<html lang="zh">\n<head><meta charset="utf-8"><title>{html.escape(title)}</title></head>\n<body>\n')
+        self.file.write(f"<h1>{html.escape(title)}</h1>\n")
+
+    def section_start(self, number, qtype, total_score, count):
+        self.file.write(f"<h2>第{number}部分 {html.escape(qtype)}（共{total_score}分，{count}题）</h2>\n<ol>\n")
+
+    def question(self, number, question, options, answer):
+        self.file.write(f"<li>（{html.escape(str(question[1]))}）{html.escape(question[3])}（{html.escape(question[2])}）")
+        if options:
+            self.file.write("<ul>" + "".join(f"<li>{html.escape(option)}</li>" for option in options) + "</ul>")
+        self.file.write("</li>\n")
+
+    def section_end(self):
+        self.file.write("</ol>\n")
+
+    def paper_end(self):
+        self.file.write("</body>\n</html>\n")
+        self.file.close()
@@ -0,0 +1,55 @@
+import hashlib
+import sys
+from collections import OrderedDict
+
+# 默认的缓存容量上限（字节）
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# 片段编号由片段内容生成，选项顺序不同的同一道题对应不同的片段
+def fragment_id(lines):
+    return hashlib.sha1('\n'.join(lines).encode('utf-8')).hexdigest()[:16]
+
+# 已排版片段的 LRU 缓存，按 (片段编号, 字体, 字号) 存储，总大小超过上限时淘汰最久未使用的片段
+class FragmentCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.fragments = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.fragments.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.fragments.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, fragment, size):
+        if key in self.fragments:
+            self.current_bytes -= self.fragments.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        self.fragments[key] = (fragment, size)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            _, (_, evicted_size) = self.fragments.popitem(last=False)
+            self.current_bytes -= evicted_size
+
+    # 命中时直接返回缓存的片段，否则调用 create 生成并按 sizeof 计算大小后放入缓存
+    def get_or_create(self, key, create, sizeof):
+        fragment = self.get(key)
+        if fragment is None:
+            fragment = create()
+            self.put(key, fragment, sizeof(fragment))
+        return fragment
+
+    def clear(self):
+        self.fragments.clear()
+        self.current_bytes = 0
+
+# 估算已排版文本行占用的内存
+def sizeof_lines(lines):
+    return sys.getsizeof(lines) + sum(sys.getsizeof(line) for line in lines)
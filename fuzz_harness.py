@@ -0,0 +1,348 @@
+import json
+import math
+import multiprocessing
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import traceback
+from main import (Parser, answer_pattern, content_score_pattern, difficulty_pattern, lexical_analysis,
+                  option_pattern, read_word_category, section_header_pattern)
+
+# 词法、语法分析的模糊测试与压力测试：生成畸形的试卷文本和 token 序列，
+# 检查正则回溯爆炸、出错恢复不终止、程序崩溃，以及耗时是否随输入规模线性增长。
+# 运行 python fuzz_harness.py [随机种子] [规模]，结果写入 output/fuzz/，发现问题时退出码为 1
+
+# 单个测试目标的最长运行时间（秒），超时视为回溯爆炸或恢复循环不终止
+TIMEOUT = 120
+# 输入规模扩大 SCALE 倍后耗时增长的幂次超过 GROWTH_LIMIT 即视为非线性（线性为 1，平方为 2）；
+# 耗时低于 MIN_FLAG_TIME 秒的测量误差太大，不据此判断
+SCALE = 4
+GROWTH_LIMIT = 1.5
+MIN_FLAG_TIME = 0.01
+OUTPUT_DIR = "./output/fuzz"
+
+# 与 lexical_analysis 中相同的调用方式
+REGEXES = {
+    "section_header_pattern": (re.compile(section_header_pattern), "match"),
+    "difficulty_pattern": (difficulty_pattern, "search"),
+    "content_score_pattern": (content_score_pattern, "search"),
+    "option_pattern": (re.compile(option_pattern), "match"),
+    "answer_pattern": (re.compile(answer_pattern), "match"),
+}
+
+# 构造畸形输入用的片段：各正则中出现的定界符、数字和关键字
+PIECES = ["(", ")", "（", "）", "1", "分", "、", "题，共", "部分", "第", "答案", "：", "A、", " ", "a", "（1", "(简单", "\t"]
+PREFIXES = ["", "1、", "1、(", "1、(简单)", "第一部分 ", "第一部分 (1", "A、", "答案："]
+PIECE_PAIR_SAMPLES = 200
+
+VALID_TYPES = ["单选题", "多选题", "判断题", "简答题"]
+VALID_DIFFICULTIES = ["简单", "中等", "困难"]
+CHINESE_NUMBERS = "一二三四五六七八九十"
+
+def best_time(function, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def growth_exponent(small_time, large_time):
+    return math.log(max(large_time, 1e-9) / max(small_time, 1e-9)) / math.log(SCALE)
+
+def seconds_per_mb(seconds, size_bytes):
+    return seconds / max(size_bytes, 1) * 2**20
+
+def is_superlinear(small_time, large_time):
+    return large_time >= MIN_FLAG_TIME and growth_exponent(small_time, large_time) > GROWTH_LIMIT
+
+# 记录当前正在运行的用例，测试进程超时被终止后据此找到导致卡死的输入
+def record_current(target, case):
+    with open(os.path.join(OUTPUT_DIR, f"{target}.current.json"), 'w', encoding='utf-8') as file:
+        json.dump(case, file, ensure_ascii=False)
+
+def read_current(target):
+    filename = os.path.join(OUTPUT_DIR, f"{target}.current.json")
+    if not os.path.exists(filename):
+        return None
+    with open(filename, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+# 同一种崩溃（异常信息相同）只保存第一个输入，其余只计数
+def add_crash(findings, target, name, content):
+    error = traceback.format_exc(limit=3)
+    message = error.strip().splitlines()[-1]
+    for finding in findings:
+        if finding["kind"] == "crash" and finding["message"] == message:
+            finding["count"] += 1
+            return
+    findings.append({"kind": "crash", "target": target, "message": message, "error": error, "count": 1,
+                     "input": save_input(name, content)})
+
+def save_input(name, content):
+    filename = os.path.join(OUTPUT_DIR, name)
+    with open(filename, 'w', encoding='utf-8') as file:
+        file.write(content)
+    return filename
+
+# 单行畸形输入：前缀加上重复的片段，长度约为 size 个字符
+def pathological_line(prefix, piece, size):
+    return prefix + piece * max(1, (size - len(prefix)) // len(piece))
+
+def regex_cases(rng):
+    cases = [(prefix, piece) for prefix in PREFIXES for piece in PIECES]
+    for _ in range(PIECE_PAIR_SAMPLES):
+        cases.append((rng.choice(PREFIXES), rng.choice(PIECES) + rng.choice(PIECES)))
+    return cases
+
+# 正则 name 在每类畸形输入上分别测量 size 和 size * SCALE 两种长度的耗时
+def fuzz_regex(seed, size, name):
+    pattern, method = REGEXES[name]
+    run = getattr(pattern, method)
+    findings = []
+    worst = None
+    max_exponent = None
+    for prefix, piece in regex_cases(random.Random(seed)):
+        record_current(name, {"pattern": name, "prefix": prefix, "piece": piece, "size": size * SCALE})
+        small, large = pathological_line(prefix, piece, size), pathological_line(prefix, piece, size * SCALE)
+        small_time, large_time = best_time(run, small), best_time(run, large)
+        exponent = growth_exponent(small_time, large_time)
+        if large_time >= MIN_FLAG_TIME:
+            max_exponent = exponent if max_exponent is None else max(max_exponent, exponent)
+        rate = seconds_per_mb(large_time, len(large.encode('utf-8')))
+        if worst is None or rate > worst[0]:
+            worst = (rate, large, prefix, piece)
+        if is_superlinear(small_time, large_time):
+            findings.append({"kind": "superlinear", "target": name, "prefix": prefix, "piece": piece,
+                             "growth_exponent": round(exponent, 2), "seconds": large_time})
+    result = {
+        "seconds_per_mb": worst[0],
+        "growth_exponent": round(max_exponent, 2) if max_exponent is not None else None,
+        "worst_case": {"seconds_per_mb": worst[0], "prefix": worst[2], "piece": worst[3],
+                       "input": save_input(f"worst_{name}.txt", worst[1])}
+    }
+    return result, findings
+
+# 生成一份格式正确的试卷，约 size 个字符
+def random_exam_lines(rng, size):
+    lines = []
+    length = 0
+    section_number = 0
+    question_number = 0
+    while length < size:
+        start = len(lines)
+        if question_number == 0 or rng.random() < 0.05:
+            section_number += 1
+            question_number = 0
+            count = rng.randint(1, 50)
+            lines.append(f"第{CHINESE_NUMBERS[section_number % 10]}部分  {rng.choice(VALID_TYPES)}({count}题，共{count * 2}分)")
+        question_number += 1
+        lines.append(f"{question_number}、({rng.choice(VALID_DIFFICULTIES)})第{question_number}题的题干（）内容？（{rng.randint(1, 10)}分）")
+        option_count = rng.choice([0, 2, 4])
+        for index in range(option_count):
+            lines.append(f"   {chr(ord('A') + index)}、选项{rng.randint(1, 100)}")
+        if option_count and rng.random() < 0.5:
+            lines.append(f"   答案：{chr(ord('A') + rng.randrange(option_count))}")
+        lines.append("")
+        length += sum(len(line) + 1 for line in lines[start:])
+    return lines
+
+# 随机破坏一行：插入、删除、替换、截断，或插入一长串重复片段
+def mutate_line(rng, line):
+    position = rng.randint(0, len(line))
+    kind = rng.randrange(5)
+    if kind == 0:
+        return line[:position] + rng.choice(PIECES) + line[position:]
+    if kind == 1:
+        return line[:position] + line[position + rng.randint(1, 10):]
+    if kind == 2:
+        return line[:position] + rng.choice(PIECES) + line[position + 1:]
+    if kind == 3:
+        return line[:position]
+    return line[:position] + rng.choice(PIECES) * rng.randint(10, 1000) + line[position:]
+
+def random_exam(rng, size, mutation_rate):
+    lines = random_exam_lines(rng, size)
+    for index in range(len(lines)):
+        if rng.random() < mutation_rate:
+            lines[index] = mutate_line(rng, lines[index])
+    # 偶尔打乱行的顺序，产生不属于任何题型的题目、不属于任何题目的选项等
+    for _ in range(int(len(lines) * mutation_rate / 10)):
+        i, j = rng.randrange(len(lines)), rng.randrange(len(lines))
+        lines[i], lines[j] = lines[j], lines[i]
+    return "\n".join(lines) + "\n"
+
+def run_lexer(text):
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.txt', delete=False) as file:
+        file.write(text)
+    try:
+        return lexical_analysis(file.name)
+    finally:
+        os.remove(file.name)
+
+def fuzz_lexer(seed, size, cases=300):
+    rng = random.Random(seed)
+    findings = []
+    worst = None
+    for case in range(cases):
+        text = random_exam(rng, rng.randint(100, 4000), rng.choice([0.05, 0.2, 0.5, 1.0]))
+        record_current("lexer", {"case": case, "input": text})
+        start = time.perf_counter()
+        try:
+            run_lexer(text)
+        except Exception:
+            add_crash(findings, "lexer", f"crash_lexer_{case}.txt", text)
+            continue
+        rate = seconds_per_mb(time.perf_counter() - start, len(text.encode('utf-8')))
+        if worst is None or rate > worst[0]:
+            worst = (rate, text)
+
+    # 同一种子生成 size 和 size * SCALE 两种规模的试卷，只做轻度破坏以保证分析能完整运行
+    small_text = random_exam(random.Random(seed), size, 0.01)
+    large_text = random_exam(random.Random(seed), size * SCALE, 0.01)
+    record_current("lexer", {"case": "scaling", "size": size * SCALE})
+    try:
+        small_time, large_time = best_time(run_lexer, small_text, repeat=1), best_time(run_lexer, large_text, repeat=1)
+    except Exception:
+        add_crash(findings, "lexer", "crash_lexer_scaling.txt", large_text)
+        small_time = large_time = 0.0
+    if is_superlinear(small_time, large_time):
+        findings.append({"kind": "superlinear", "target": "lexer", "growth_exponent": round(growth_exponent(small_time, large_time), 2),
+                         "seconds": large_time})
+    result = {
+        "seconds_per_mb": seconds_per_mb(large_time, len(large_text.encode('utf-8'))),
+        "growth_exponent": round(growth_exponent(small_time, large_time), 2),
+        "worst_case": {"seconds_per_mb": worst[0], "input": save_input("worst_lexer.txt", worst[1])} if worst else None
+    }
+    return result, findings
+
+# 生成一段格式正确的 token 序列，再随机删除、重复、交换、替换其中的 token
+def random_tokens(rng, word_category, count, mutation_rate):
+    tokens = []
+    while len(tokens) < count:
+        question_count = rng.randint(1, 20)
+        tokens += [(word_category["TYPE"], rng.choice(VALID_TYPES)), (word_category["COUNT"], str(question_count)),
+                   (word_category["TOTAL SCORE"], str(question_count * 2))]
+        for _ in range(question_count):
+            tokens += [(word_category["DIFFICULTY"], rng.choice(VALID_DIFFICULTIES)), (word_category["SCORE"], "2"),
+                       (word_category["CONTENT"], "题干")]
+            option_count = rng.choice([0, 2, 4])
+            tokens += [(word_category["OPTION"], f"{chr(ord('A') + index)}、选项") for index in range(option_count)]
+            if option_count and rng.random() < 0.5:
+                tokens.append((word_category["ANSWER"], "A"))
+    token_types = list(word_category.values())
+    for _ in range(int(len(tokens) * mutation_rate)):
+        index = rng.randrange(len(tokens))
+        kind = rng.randrange(5)
+        if kind == 0:
+            del tokens[index]
+        elif kind == 1:
+            tokens.insert(index, tokens[index])
+        elif kind == 2:
+            other = rng.randrange(len(tokens))
+            tokens[index], tokens[other] = tokens[other], tokens[index]
+        elif kind == 3:
+            tokens[index] = (rng.choice(token_types), tokens[index][1])
+        else:
+            tokens[index] = (word_category["OPTION"], rng.choice(["A、", "B、x", "E、x", "x"]))
+        if not tokens:
+            break
+    return tokens + [("$", "$")]
+
+def run_parser(tokens, word_category):
+    parser = Parser(tokens, word_category, os.devnull, max_errors=None)
+    parser.parse()
+    return parser
+
+def tokens_text(tokens):
+    return "".join(f"<{token[0]}, \"{token[1]}\">\n" for token in tokens)
+
+def fuzz_parser(seed, size, cases=300):
+    rng = random.Random(seed)
+    word_category = read_word_category('word_category.json')
+    findings = []
+    worst = None
+    for case in range(cases):
+        tokens = random_tokens(rng, word_category, rng.randint(0, 500), rng.choice([0.05, 0.2, 0.5, 1.0]))
+        record_current("parser", {"case": case, "tokens": tokens})
+        start = time.perf_counter()
+        try:
+            parser = run_parser(tokens, word_category)
+        except Exception:
+            add_crash(findings, "parser", f"crash_parser_{case}.txt", tokens_text(tokens))
+            continue
+        # 出错恢复必须把所有 token 处理完
+        if parser.position < len(tokens):
+            findings.append({"kind": "incomplete", "target": "parser", "position": parser.position,
+                             "input": save_input(f"incomplete_parser_{case}.txt", tokens_text(tokens))})
+        rate = seconds_per_mb(time.perf_counter() - start, len(tokens_text(tokens).encode('utf-8')))
+        if worst is None or rate > worst[0]:
+            worst = (rate, tokens)
+
+    # 破坏程度高的大规模 token 序列，使恢复逻辑被大量触发
+    small_tokens = random_tokens(random.Random(seed), word_category, size, 0.5)
+    large_tokens = random_tokens(random.Random(seed), word_category, size * SCALE, 0.5)
+    record_current("parser", {"case": "scaling", "size": len(large_tokens)})
+    small_time = best_time(run_parser, small_tokens, word_category)
+    large_time = best_time(run_parser, large_tokens, word_category)
+    if is_superlinear(small_time, large_time):
+        findings.append({"kind": "superlinear", "target": "parser", "growth_exponent": round(growth_exponent(small_time, large_time), 2),
+                         "seconds": large_time})
+    result = {
+        "seconds_per_mb": seconds_per_mb(large_time, len(tokens_text(large_tokens).encode('utf-8'))),
+        "growth_exponent": round(growth_exponent(small_time, large_time), 2),
+        "worst_case": {"seconds_per_mb": worst[0], "input": save_input("worst_parser.txt", tokens_text(worst[1]))} if worst else None
+    }
+    return result, findings
+
+# 在独立进程中运行一个测试目标，超时则终止进程并报告最后一个用例
+def run_target(name, function, *args):
+    pool = multiprocessing.Pool(1)
+    try:
+        result, findings = pool.apply_async(function, args).get(TIMEOUT)
+        pool.close()
+    except multiprocessing.TimeoutError:
+        pool.terminate()
+        case = read_current(name)
+        result = None
+        findings = [{"kind": "timeout", "target": name, "seconds": TIMEOUT,
+                     "input": save_input(f"timeout_{name}.json", json.dumps(case, ensure_ascii=False))}]
+    pool.join()
+    return result, findings
+
+def run_harness(seed=0, size=20000):
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+    report = {"seed": seed, "size": size, "scale": SCALE, "growth_limit": GROWTH_LIMIT, "targets": {}, "findings": []}
+    targets = [(name, fuzz_regex, (seed, size, name)) for name in REGEXES]
+    targets += [("lexer", fuzz_lexer, (seed, size)), ("parser", fuzz_parser, (seed, size))]
+    for name, function, args in targets:
+        result, findings = run_target(name, function, *args)
+        report["targets"][name] = result
+        report["findings"] += findings
+    with open(os.path.join(OUTPUT_DIR, "fuzz_report.json"), 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=4)
+    return report
+
+def format_report(report):
+    lines = []
+    for name, result in report["targets"].items():
+        if result:
+            exponent = result['growth_exponent'] if result['growth_exponent'] is not None else "（耗时过短，未测量）"
+            lines.append(f"{name}: {result['seconds_per_mb']:.3f} 秒/MB，增长幂次 {exponent}，"
+                         f"最坏用例 {result['worst_case']['seconds_per_mb']:.3f} 秒/MB")
+    for finding in report["findings"]:
+        lines.append(f"发现问题：{finding['kind']} {finding['target']} {finding.get('message', '')} {finding.get('input', '')}")
+    if not report["findings"]:
+        lines.append("未发现问题")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    report = run_harness(seed, size)
+    print(format_report(report))
+    sys.exit(1 if report["findings"] else 0)
@@ -1,4 +1,6 @@
+import bisect
 import json
+from diagnostics import Diagnostics, SourceSpans
 
 # 读取单词类别表和tokens文件
 def read_word_category(file_path):
@@ -27,12 +29,24 @@ tokens = read_tokens(tokens_file)
 
 # 解析器类定义
 class Parser:
-    def __init__(self, tokens, word_category, result_file):
+    def __init__(self, tokens, word_category, result_file, max_errors=100, diagnostics=None):
         self.tokens = tokens
         self.word_category = word_category
         self.position = 0
         self.errors = []
         self.result_file = result_file
+        self.diagnostics = diagnostics
+        # 错误数达到 max_errors 后中止分析（None 表示不限制），相同的错误只报告一次
+        self.max_errors = max_errors
+        self.reported_errors = set()
+        self.suppressed_errors = 0
+        self.aborted = False
+        # 预先计算同步点的位置，出错时二分查找直接跳到下一个同步点
+        block_end_types = {self.word_category["TYPE"], "$"}
+        question_sync_types = block_end_types | {self.word_category["DIFFICULTY"]}
+        self.block_end_types = block_end_types
+        self.question_sync_points = [i for i, token in enumerate(tokens) if token[0] in question_sync_types]
+        self.type_sync_points = [i for i, token in enumerate(tokens) if token[0] in block_end_types]
         with open(self.result_file, 'w', encoding='utf-8') as file:
             file.write("<试卷> ")
 
@@ -56,17 +70,36 @@ class Parser:
         with open(self.result_file, 'a', encoding='utf-8') as file:
             file.write(f"<{token[0]}, \"{token[1]}\"> ")
 
+    def report_error(self, message):
+        if self.aborted:
+            return
+        if message in self.reported_errors:
+            self.suppressed_errors += 1
+            return
+        self.reported_errors.add(message)
+        line = self.diagnostics.line_of(self.position) if self.diagnostics else None
+        location = f"token {self.position}" if line is None else f"token {self.position} (line {line})"
+        self.errors.append(f"Error at {location}: {message}")
+        if self.diagnostics:
+            self.diagnostics.add("grammar", self.errors[-1], self.position)
+        if self.max_errors is not None and len(self.errors) >= self.max_errors:
+            self.errors.append(f"Too many errors ({len(self.errors)}), parsing aborted")
+            if self.diagnostics:
+                self.diagnostics.add("grammar", self.errors[-1])
+            self.aborted = True
+            self.position = len(self.tokens)
+
     def parse_option(self):
         expected_option = "A"
         while self.current_token() and self.current_token()[0] == self.word_category["OPTION"]:
             current_token = self.current_token()
             option_value = current_token[1]
             if not option_value.startswith(expected_option + "、"):
-                self.errors.append(f"Error at token {self.position}: Expected option {expected_option}, got {current_token}")
+                self.report_error(f"Expected option {expected_option}, got {current_token}")
                 self.skip_to_next_question_or_type()
                 return False
             if option_value == expected_option + "、":
-                self.errors.append(f"Error at token {self.position}: Option {expected_option} content is empty")
+                self.report_error(f"Option {expected_option} content is empty")
                 self.skip_to_next_question_or_type()
                 return False
             expected_option = chr(ord(expected_option) + 1)
@@ -76,52 +109,61 @@ class Parser:
 
     def parse_question(self):
         if not self.match(self.word_category["DIFFICULTY"]):
-            self.errors.append(f"Error at token {self.position}: Expected DIFFICULTY, Unexpected token {self.current_token()}")
+            self.report_error(f"Expected DIFFICULTY, Unexpected token {self.current_token()}")
             self.skip_to_next_question_or_type()
             return False
         if not self.match(self.word_category["SCORE"]):
-            self.errors.append(f"Error at token {self.position}: Expected SCORE, Unexpected token {self.current_token()}")
+            self.report_error(f"Expected SCORE, Unexpected token {self.current_token()}")
             self.skip_to_next_question_or_type()
             return False
         if not self.match(self.word_category["CONTENT"]):
-            self.errors.append(f"Error at token {self.position}: Expected CONTENT, Unexpected token {self.current_token()}")
+            self.report_error(f"Expected CONTENT, Unexpected token {self.current_token()}")
             self.skip_to_next_question_or_type()
             return False
         self.parse_option()
+        # 答案是可选的，位于选项之后
+        self.match(self.word_category["ANSWER"])
         return True
 
+    # 每个题型块至少包含一道题；出错后一定会前进到下一个同步点，不会原地重复报错
     def parse_question_block(self):
-        while self.position < len(self.tokens):
-            if not self.parse_question():
-                continue
-            if self.current_token() and self.current_token()[0] in [self.word_category["TYPE"], "$"]:
-                break
+        self.parse_question()
+        while self.current_token() and self.current_token()[0] not in self.block_end_types:
+            self.parse_question()
 
     def parse_question_type_block(self):
         if not self.match(self.word_category["TYPE"]):
-            self.errors.append(f"Error at token {self.position}: Expected TYPE, Unexpected token {self.current_token()}")
+            self.report_error(f"Expected TYPE, Unexpected token {self.current_token()}")
             return False
         if not self.match(self.word_category["COUNT"]):
-            self.errors.append(f"Error at token {self.position}: Expected COUNT, Unexpected token {self.current_token()}")
+            self.report_error(f"Expected COUNT, Unexpected token {self.current_token()}")
             return False
         if not self.match(self.word_category["TOTAL SCORE"]):
-            self.errors.append(f"Error at token {self.position}: Expected TOTAL SCORE, Unexpected token {self.current_token()}")
+            self.report_error(f"Expected TOTAL SCORE, Unexpected token {self.current_token()}")
             return False
         self.parse_question_block()
         return True
 
+    def skip_to_sync_point(self, sync_points):
+        index = bisect.bisect_left(sync_points, self.position)
+        self.position = sync_points[index] if index < len(sync_points) else len(self.tokens)
+
     def skip_to_next_question_or_type(self):
-        while self.current_token() and self.current_token()[0] not in [self.word_category["DIFFICULTY"], "$"]:
-            self.advance()
+        self.skip_to_sync_point(self.question_sync_points)
+
+    def skip_to_next_type(self):
+        self.skip_to_sync_point(self.type_sync_points)
 
     def parse(self):
         while self.position < len(self.tokens):
-            if self.current_token() and self.current_token()[0] == "$":
+            if self.current_token()[0] == "$":
                 break
             if not self.parse_question_type_block():
-                self.skip_to_next_question_or_type()
+                self.skip_to_next_type()
         if self.current_token() and self.current_token()[0] == "$":
             self.advance()
+        if self.suppressed_errors:
+            self.errors.append(f"{self.suppressed_errors} duplicate errors suppressed")
         return not self.errors
 
 # 主解析器入口
@@ -129,12 +171,15 @@ def main():
     tokens = read_tokens("./output/tokens.txt")
     word_category = read_word_category("word_category.json")
     result_file = "./output/parsed_tokens.txt"
-    parser = Parser(tokens, word_category, result_file)
+    spans = SourceSpans.load("./output/tokens.spans", sum(1 for token in tokens if token[0] != "$"))
+    diagnostics = Diagnostics(spans)
+    parser = Parser(tokens, word_category, result_file, diagnostics=diagnostics)
     if parser.parse():
         print("grammar analysis success")
     else:
         print("grammar analysis failed")
         for error in parser.errors:
             print(error)
+    diagnostics.save("./output/grammar_diagnostics.sarif")
 
 main()
@@ -1,26 +1,32 @@
 import re
+from diagnostics import Diagnostics, match_span
 
 # 正则表达式预定义
-section_header_pattern = r'第\w部分\s+(.*?)(\(\d+题，共\d+分\))'
+# 题型名称必须以非空白字符开头（或为空），\s+ 只有一种匹配方式，避免行中大量空白时平方级回溯
+section_header_pattern = r'第\w部分\s+(|\S.*?)(\(\d+题，共\d+分\))'
 # 更新后的题干内容匹配正则表达式
-difficulty_pattern = re.compile(r'\((?P<difficulty>[^)]*)\)')
+# 只尝试第一个左括号（与从每个左括号依次尝试的结果相同），避免大量未闭合的括号导致平方级回溯
+difficulty_pattern = re.compile(r'^[^(]*\((?P<difficulty>[^)]*)\)')
 content_score_pattern = re.compile(r'^\d+、(?:\([^）]*\))?(?P<content>.*?)(?:（(?P<score>\d+)分）|$)')
 option_pattern = r'\s*([A-D])、\s*(.*)'
+answer_pattern = r'\s*答案[:：]\s*(.*)'
 
 # 有效的难度和题型
 valid_difficulties = {"简单", "中等", "困难"}
 valid_types = {"单选题", "多选题", "判断题", "简答题"}
 errors = []
 
-def parse_questions(filename):
+def parse_questions(filename, diagnostics=None):
     questions = []
     current_section = None
     current_question = None
     line_number = 0
+    file_id = diagnostics.spans.add_file(filename) if diagnostics else 0
 
     with open(filename, 'r', encoding='utf-8') as file:
         for line in file:
             line_number += 1
+            column = len(line) - len(line.lstrip()) + 1  # 去掉行首空白后第一个字符的列号
             line = line.strip()
             if not line:
                 continue
@@ -29,22 +35,35 @@ def parse_questions(filename):
             section_match = re.match(section_header_pattern, line)
             if section_match:
                 section_type = section_match.group(1).strip()
-                count_score_match = re.findall(r'\d+', section_match.group(2))
-                count = count_score_match[0]
-                total_score = count_score_match[1]
+                count_score_match = list(re.finditer(r'\d+', section_match.group(2)))
+                count = count_score_match[0].group()
+                total_score = count_score_match[1].group()
+                type_span = match_span(file_id, line_number, column, section_match, 1)
                 if section_type not in valid_types:
                     errors.append(f"词法分析错误：无效的题型 '{section_type}' 在第 {line_number} 行")
+                    if diagnostics:
+                        diagnostics.add("lexical", errors[-1], type_span)
                 current_section = {
                     "type": section_type,
                     "count": count,
                     "total_score": total_score,
-                    "questions": []
+                    "questions": [],
+                    "spans": {
+                        "type": type_span,
+                        "count": match_span(file_id, line_number, column, count_score_match[0], 0, section_match.start(2)),
+                        "total_score": match_span(file_id, line_number, column, count_score_match[1], 0, section_match.start(2))
+                    }
                 }
                 questions.append(current_section)
                 continue
 
             content_score_match = content_score_pattern.search(line)
             if content_score_match:
+                if current_section is None:
+                    errors.append(f"词法分析错误：题目不属于任何题型 在第 {line_number} 行")
+                    if diagnostics:
+                        diagnostics.add("lexical", errors[-1], (file_id, line_number, column, column + len(line)))
+                    continue
                 content = content_score_match.group('content').strip() if content_score_match.group('content') else None
                 score = content_score_match.group('score') if content_score_match.group('score') else None
 
@@ -57,42 +76,71 @@ def parse_questions(filename):
                         difficulty = potential_difficulty
                     if potential_difficulty and potential_difficulty not in valid_difficulties:
                         errors.append(f"词法分析错误：无效的难度 '{potential_difficulty}' 在第 {line_number} 行")
+                        if diagnostics:
+                            diagnostics.add("lexical", errors[-1], match_span(file_id, line_number, column, difficulty_match, 'difficulty'))
                 current_question = {
                     "difficulty": difficulty,
                     "content": content,
                     "score": score,
-                    "options": []
+                    "options": [],
+                    "answer": None,
+                    "spans": {
+                        "difficulty": match_span(file_id, line_number, column, difficulty_match, 'difficulty') if difficulty else None,
+                        "score": match_span(file_id, line_number, column, content_score_match, 'score') if score else None,
+                        "content": match_span(file_id, line_number, column, content_score_match, 'content') if content else None,
+                        "answer": None,
+                        "options": []
+                    }
                 }
                 current_section["questions"].append(current_question)
                 continue
 
+            answer_match = re.match(answer_pattern, line)
+            if answer_match and current_question:
+                current_question["answer"] = answer_match.group(1).strip()
+                current_question["spans"]["answer"] = match_span(file_id, line_number, column, answer_match, 1)
+                continue
+
             option_match = re.match(option_pattern, line)
             if option_match and current_question:
                 current_question["options"].append(option_match.group(1) + '、' + option_match.group(2))
+                current_question["spans"]["options"].append((file_id, line_number, column + option_match.start(1), column + option_match.end(2)))
 
     return questions
 
-def generate_tokens(questions):
+# spans 不为 None 时同时记录每个 token 在源文件中的位置，与 tokens 一一对应
+def generate_tokens(questions, spans=None):
     tokens = []
+
+    def emit(token_type, value, span):
+        tokens.append((token_type, value))
+        if spans is not None:
+            spans.add(*span)
+
     for section in questions:
-        tokens.append((1, section["type"]))
-        tokens.append((2, section["count"]))
-        tokens.append((3, section["total_score"]))
+        emit(1, section["type"], section["spans"]["type"])
+        emit(2, section["count"], section["spans"]["count"])
+        emit(3, section["total_score"], section["spans"]["total_score"])
         for question in section["questions"]:
             if question["difficulty"]:
-                tokens.append((4, question["difficulty"]))
+                emit(4, question["difficulty"], question["spans"]["difficulty"])
             if question["score"]:
-                tokens.append((5, question["score"]))
+                emit(5, question["score"], question["spans"]["score"])
             if question["content"]:
-                tokens.append((6, question["content"]))
-            for option in question["options"]:
-                tokens.append((7, option))
+                emit(6, question["content"], question["spans"]["content"])
+            for option, span in zip(question["options"], question["spans"]["options"]):
+                emit(7, option, span)
+            if question["answer"]:
+                emit(8, question["answer"], question["spans"]["answer"])
     return tokens
 
 # Example usage
 filename = r"./src/examples.txt"
-questions = parse_questions(filename)
-tokens = generate_tokens(questions)
+diagnostics = Diagnostics()
+questions = parse_questions(filename, diagnostics)
+tokens = generate_tokens(questions, diagnostics.spans)
+diagnostics.spans.save('./output/tokens.spans')
+diagnostics.save('./output/lexical_diagnostics.sarif')
 
 with open('./output/tokens.txt', 'w', encoding='utf-8') as f:
     for token in tokens:
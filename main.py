@@ -1,7 +1,14 @@
+import asyncio
+import bisect
 import json
+import queue
 import re
+import threading
 import tkinter as tk
-from tkinter import scrolledtext
+from virtual_text import VirtualTextView
+from diagnostics import Diagnostics, SourceSpans, match_span
+from question_bank import QuestionBank
+from semantic_analysis import SemanticAnalyzer, read_tokens_from_file
 
 # 读取单词类别表和tokens文件
 def read_word_category(file_path):
@@ -21,13 +28,17 @@ def read_tokens(file_path):
             tokens.append((token_type, token_value))
     return tokens
 
-# 词法分析函数
-def lexical_analysis(filename):
-    section_header_pattern = r'第\w部分\s+(.*?)(\(\d+题，共\d+分\))'
-    difficulty_pattern = re.compile(r'\((?P<difficulty>[^)]*)\)')
-    content_score_pattern = re.compile(r'^\d+、(?:\([^）]*\))?(?P<content>.*?)(?:（(?P<score>\d+)分）|$)')
-    option_pattern = r'\s*([A-D])、\s*(.*)'
+# 词法分析使用的正则表达式
+# 题型名称必须以非空白字符开头（或为空），\s+ 只有一种匹配方式，避免行中大量空白时平方级回溯
+section_header_pattern = r'第\w部分\s+(|\S.*?)(\(\d+题，共\d+分\))'
+# 只尝试第一个左括号（与从每个左括号依次尝试的结果相同），避免大量未闭合的括号导致平方级回溯
+difficulty_pattern = re.compile(r'^[^(]*\((?P<difficulty>[^)]*)\)')
+content_score_pattern = re.compile(r'^\d+、(?:\([^）]*\))?(?P<content>.*?)(?:（(?P<score>\d+)分）|$)')
+option_pattern = r'\s*([A-D])、\s*(.*)'
+answer_pattern = r'\s*答案[:：]\s*(.*)'
 
+# 词法分析函数
+def lexical_analysis(filename, diagnostics=None):
     valid_difficulties = {"简单", "中等", "困难"}
     valid_types = {"单选题", "多选题", "判断题", "简答题"}
     errors = []
@@ -36,10 +47,12 @@ def lexical_analysis(filename):
     current_section = None
     current_question = None
     line_number = 0
+    file_id = diagnostics.spans.add_file(filename) if diagnostics else 0
 
     with open(filename, 'r', encoding='utf-8') as file:
         for line in file:
             line_number += 1
+            column = len(line) - len(line.lstrip()) + 1  # 去掉行首空白后第一个字符的列号
             line = line.strip()
             if not line:
                 continue
@@ -47,22 +60,35 @@ def lexical_analysis(filename):
             section_match = re.match(section_header_pattern, line)
             if section_match:
                 section_type = section_match.group(1).strip()
-                count_score_match = re.findall(r'\d+', section_match.group(2))
-                count = count_score_match[0]
-                total_score = count_score_match[1]
+                count_score_match = list(re.finditer(r'\d+', section_match.group(2)))
+                count = count_score_match[0].group()
+                total_score = count_score_match[1].group()
+                type_span = match_span(file_id, line_number, column, section_match, 1)
                 if section_type not in valid_types:
                     errors.append(f"词法分析错误：无效的题型 '{section_type}' 在第 {line_number} 行")
+                    if diagnostics:
+                        diagnostics.add("lexical", errors[-1], type_span)
                 current_section = {
                     "type": section_type,
                     "count": count,
                     "total_score": total_score,
-                    "questions": []
+                    "questions": [],
+                    "spans": {
+                        "type": type_span,
+                        "count": match_span(file_id, line_number, column, count_score_match[0], 0, section_match.start(2)),
+                        "total_score": match_span(file_id, line_number, column, count_score_match[1], 0, section_match.start(2))
+                    }
                 }
                 questions.append(current_section)
                 continue
 
             content_score_match = content_score_pattern.search(line)
             if content_score_match:
+                if current_section is None:
+                    errors.append(f"词法分析错误：题目不属于任何题型 在第 {line_number} 行")
+                    if diagnostics:
+                        diagnostics.add("lexical", errors[-1], (file_id, line_number, column, column + len(line)))
+                    continue
                 content = content_score_match.group('content').strip() if content_score_match.group('content') else None
                 score = content_score_match.group('score') if content_score_match.group('score') else None
 
@@ -75,46 +101,84 @@ def lexical_analysis(filename):
                         difficulty = potential_difficulty
                     if potential_difficulty and potential_difficulty not in valid_difficulties:
                         errors.append(f"词法分析错误：无效的难度 '{potential_difficulty}' 在第 {line_number} 行")
+                        if diagnostics:
+                            diagnostics.add("lexical", errors[-1], match_span(file_id, line_number, column, difficulty_match, 'difficulty'))
                 current_question = {
                     "difficulty": difficulty,
                     "content": content,
                     "score": score,
-                    "options": []
+                    "options": [],
+                    "answer": None,
+                    "spans": {
+                        "difficulty": match_span(file_id, line_number, column, difficulty_match, 'difficulty') if difficulty else None,
+                        "score": match_span(file_id, line_number, column, content_score_match, 'score') if score else None,
+                        "content": match_span(file_id, line_number, column, content_score_match, 'content') if content else None,
+                        "answer": None,
+                        "options": []
+                    }
                 }
                 current_section["questions"].append(current_question)
                 continue
 
+            answer_match = re.match(answer_pattern, line)
+            if answer_match and current_question:
+                current_question["answer"] = answer_match.group(1).strip()
+                current_question["spans"]["answer"] = match_span(file_id, line_number, column, answer_match, 1)
+                continue
+
             option_match = re.match(option_pattern, line)
             if option_match and current_question:
                 current_question["options"].append(option_match.group(1) + '、' + option_match.group(2))
+                current_question["spans"]["options"].append((file_id, line_number, column + option_match.start(1), column + option_match.end(2)))
 
-    return questions, generate_tokens(questions), errors
+    return questions, generate_tokens(questions, diagnostics.spans if diagnostics else None), errors
 
-def generate_tokens(questions):
+# spans 不为 None 时同时记录每个 token 在源文件中的位置，与 tokens 一一对应
+def generate_tokens(questions, spans=None):
     tokens = []
+
+    def emit(token_type, value, span):
+        tokens.append((token_type, value))
+        if spans is not None:
+            spans.add(*span)
+
     for section in questions:
-        tokens.append((1, section["type"]))
-        tokens.append((2, section["count"]))
-        tokens.append((3, section["total_score"]))
+        emit(1, section["type"], section["spans"]["type"])
+        emit(2, section["count"], section["spans"]["count"])
+        emit(3, section["total_score"], section["spans"]["total_score"])
         for question in section["questions"]:
             if question["difficulty"]:
-                tokens.append((4, question["difficulty"]))
+                emit(4, question["difficulty"], question["spans"]["difficulty"])
             if question["score"]:
-                tokens.append((5, question["score"]))
+                emit(5, question["score"], question["spans"]["score"])
             if question["content"]:
-                tokens.append((6, question["content"]))
-            for option in question["options"]:
-                tokens.append((7, option))
+                emit(6, question["content"], question["spans"]["content"])
+            for option, span in zip(question["options"], question["spans"]["options"]):
+                emit(7, option, span)
+            if question["answer"]:
+                emit(8, question["answer"], question["spans"]["answer"])
     return tokens
 
 # 语法分析函数
 class Parser:
-    def __init__(self, tokens, word_category, result_file):
+    def __init__(self, tokens, word_category, result_file, max_errors=100, diagnostics=None):
         self.tokens = tokens
         self.word_category = word_category
         self.position = 0
         self.errors = []
         self.result_file = result_file
+        self.diagnostics = diagnostics
+        # 错误数达到 max_errors 后中止分析（None 表示不限制），相同的错误只报告一次
+        self.max_errors = max_errors
+        self.reported_errors = set()
+        self.suppressed_errors = 0
+        self.aborted = False
+        # 预先计算同步点的位置，出错时二分查找直接跳到下一个同步点
+        block_end_types = {self.word_category["TYPE"], "$"}
+        question_sync_types = block_end_types | {self.word_category["DIFFICULTY"]}
+        self.block_end_types = block_end_types
+        self.question_sync_points = [i for i, token in enumerate(tokens) if token[0] in question_sync_types]
+        self.type_sync_points = [i for i, token in enumerate(tokens) if token[0] in block_end_types]
         with open(self.result_file, 'w', encoding='utf-8') as file:
             file.write("<试卷> ")
 
@@ -138,17 +202,36 @@ class Parser:
         with open(self.result_file, 'a', encoding='utf-8') as file:
             file.write(f"<{token[0]}, \"{token[1]}\"> ")
 
+    def report_error(self, message):
+        if self.aborted:
+            return
+        if message in self.reported_errors:
+            self.suppressed_errors += 1
+            return
+        self.reported_errors.add(message)
+        line = self.diagnostics.line_of(self.position) if self.diagnostics else None
+        location = f"token {self.position}" if line is None else f"token {self.position} (line {line})"
+        self.errors.append(f"Error at {location}: {message}")
+        if self.diagnostics:
+            self.diagnostics.add("grammar", self.errors[-1], self.position)
+        if self.max_errors is not None and len(self.errors) >= self.max_errors:
+            self.errors.append(f"Too many errors ({len(self.errors)}), parsing aborted")
+            if self.diagnostics:
+                self.diagnostics.add("grammar", self.errors[-1])
+            self.aborted = True
+            self.position = len(self.tokens)
+
     def parse_option(self):
         expected_option = "A"
         while self.current_token() and self.current_token()[0] == self.word_category["OPTION"]:
             current_token = self.current_token()
             option_value = current_token[1]
             if not option_value.startswith(expected_option + "、"):
-                self.errors.append(f"Error at token {self.position}: Expected option {expected_option}, got {current_token}")
+                self.report_error(f"Expected option {expected_option}, got {current_token}")
                 self.skip_to_next_question_or_type()
                 return False
             if option_value == expected_option + "、":
-                self.errors.append(f"Error at token {self.position}: Option {expected_option} content is empty")
+                self.report_error(f"Option {expected_option} content is empty")
                 self.skip_to_next_question_or_type()
                 return False
             expected_option = chr(ord(expected_option) + 1)
@@ -158,59 +241,72 @@ class Parser:
 
     def parse_question(self):
         if not self.match(self.word_category["DIFFICULTY"]):
-            self.errors.append(f"Error at token {self.position}: Expected DIFFICULTY, Unexpected token {self.current_token()}")
+            self.report_error(f"Expected DIFFICULTY, Unexpected token {self.current_token()}")
             self.skip_to_next_question_or_type()
             return False
         if not self.match(self.word_category["SCORE"]):
-            self.errors.append(f"Error at token {self.position}: Expected SCORE, Unexpected token {self.current_token()}")
+            self.report_error(f"Expected SCORE, Unexpected token {self.current_token()}")
             self.skip_to_next_question_or_type()
             return False
         if not self.match(self.word_category["CONTENT"]):
-            self.errors.append(f"Error at token {self.position}: Expected CONTENT, Unexpected token {self.current_token()}")
+            self.report_error(f"Expected CONTENT, Unexpected token {self.current_token()}")
             self.skip_to_next_question_or_type()
             return False
         self.parse_option()
+        # 答案是可选的，位于选项之后
+        self.match(self.word_category["ANSWER"])
         return True
 
+    # 每个题型块至少包含一道题；出错后一定会前进到下一个同步点，不会原地重复报错
     def parse_question_block(self):
-        while self.position < len(self.tokens):
-            if not self.parse_question():
-                continue
-            if self.current_token() and self.current_token()[0] in [self.word_category["TYPE"], "$"]:
-                break
+        self.parse_question()
+        while self.current_token() and self.current_token()[0] not in self.block_end_types:
+            self.parse_question()
 
     def parse_question_type_block(self):
         if not self.match(self.word_category["TYPE"]):
-            self.errors.append(f"Error at token {self.position}: Expected TYPE, Unexpected token {self.current_token()}")
+            self.report_error(f"Expected TYPE, Unexpected token {self.current_token()}")
             return False
         if not self.match(self.word_category["COUNT"]):
-            self.errors.append(f"Error at token {self.position}: Expected COUNT, Unexpected token {self.current_token()}")
+            self.report_error(f"Expected COUNT, Unexpected token {self.current_token()}")
             return False
         if not self.match(self.word_category["TOTAL SCORE"]):
-            self.errors.append(f"Error at token {self.position}: Expected TOTAL SCORE, Unexpected token {self.current_token()}")
+            self.report_error(f"Expected TOTAL SCORE, Unexpected token {self.current_token()}")
             return False
         self.parse_question_block()
         return True
 
+    def skip_to_sync_point(self, sync_points):
+        index = bisect.bisect_left(sync_points, self.position)
+        self.position = sync_points[index] if index < len(sync_points) else len(self.tokens)
+
     def skip_to_next_question_or_type(self):
-        while self.current_token() and self.current_token()[0] not in [self.word_category["DIFFICULTY"], "$"]:
-            self.advance()
+        self.skip_to_sync_point(self.question_sync_points)
+
+    def skip_to_next_type(self):
+        self.skip_to_sync_point(self.type_sync_points)
 
     def parse(self):
         while self.position < len(self.tokens):
-            if self.current_token() and self.current_token()[0] == "$":
+            if self.current_token()[0] == "$":
                 break
             if not self.parse_question_type_block():
-                self.skip_to_next_question_or_type()
+                self.skip_to_next_type()
         if self.current_token() and self.current_token()[0] == "$":
             self.advance()
+        if self.suppressed_errors:
+            self.errors.append(f"{self.suppressed_errors} duplicate errors suppressed")
         return not self.errors
 
 # 语法分析主函数
 def syntactical_analysis(tokens, word_category_filename):
     word_category = read_word_category(word_category_filename)
-    parser = Parser(tokens, word_category, './output/parsed_tokens.txt')
-    if parser.parse():
+    spans = SourceSpans.load('./output/tokens.spans', sum(1 for token in tokens if token[0] != "$"))
+    diagnostics = Diagnostics(spans)
+    parser = Parser(tokens, word_category, './output/parsed_tokens.txt', diagnostics=diagnostics)
+    success = parser.parse()
+    diagnostics.save('./output/grammar_diagnostics.sarif')
+    if success:
         with open('./output/parsed_tokens.txt', 'r', encoding='utf-8') as file:
             parsed_content = file.read()
         return "语法分析完成，无错误", parser.errors, parsed_content
@@ -219,159 +315,20 @@ def syntactical_analysis(tokens, word_category_filename):
             parsed_content = file.read()
         return "语法分析完成，但存在错误", parser.errors, parsed_content
 
-# 语义分析函数
-def read_tokens_from_file(filename):
-    tokens = []
-    line_number = 1
-    with open(filename, 'r', encoding='utf-8') as file:
-        for line in file:
-            line = line.strip()
-            if not line:
-                continue
-            match = re.match(r'<(\d+),\s*"([^"]*)">', line)
-            if match:
-                token_type = int(match.group(1))
-                value = match.group(2)
-                tokens.append((token_type, value, line_number))
-            line_number += 1
-    return tokens
-
-# 读取单词类别表
-def read_word_category(filename):
-    with open(filename, 'r', encoding='utf-8') as file:
-        return json.load(file)
-
-# 获取单词类别的名称
-def get_word_category_name(word_category, token_type):
-    for name, type_id in word_category.items():
-        if type_id == token_type:
-            return name
-    return str(token_type)
-
-# 语义分析器类
-class SemanticAnalyzer:
-    def __init__(self, tokens, word_category):
-        self.tokens = tokens
-        self.word_category = word_category
-        self.index = 0
-        self.current_type = None
-        self.expected_count = 0
-        self.expected_total_score = 0
-        self.actual_count = 0
-        self.actual_total_score = 0
-        self.questions = []
-        self.difficulty_score_map = {
-            "简单": None,
-            "中等": None,
-            "困难": None
-        }
-        self.errors = []
-
-    def current_token(self):
-        if self.index < len(self.tokens):
-            return self.tokens[self.index]
-        return None
-
-    def match(self, expected_type):
-        token = self.current_token()
-        if token and token[0] == expected_type:
-            self.index += 1
-            return token
-        expected_name = get_word_category_name(self.word_category, expected_type)
-        self.index += 1  # Skip this token and continue
-        return None
-
-    def analyze(self):
-        while self.current_token():
-            self.current_type = self.match(self.word_category["TYPE"])[1]
-            self.expected_count = int(self.match(self.word_category["COUNT"])[1])
-            self.expected_total_score = int(self.match(self.word_category["TOTAL SCORE"])[1])
-            self.actual_count = 0
-            self.actual_total_score = 0
-            self.difficulty_score_map = {
-                "简单": None,
-                "中等": None,
-                "困难": None
-            }
-            self.analyze_question_list()
-
-            # 验证题目数量和总分数
-            if self.actual_count != self.expected_count:
-                current_token = self.current_token()
-                self.errors.append(f"语义错误: 预期题目数量 {self.expected_count}, 但实际数量为 {self.actual_count} at line {current_token[2] if current_token else 'EOF'}")
-            if self.actual_total_score != self.expected_total_score:
-                current_token = self.current_token()
-                self.errors.append(f"语义错误: 预期总分数 {self.expected_total_score}, 但实际分数为 {self.actual_total_score} at line {current_token[2] if current_token else 'EOF'}")
-
-    def analyze_question_list(self):
-        while self.current_token() and self.current_token()[0] in [self.word_category["DIFFICULTY"], self.word_category["SCORE"], self.word_category["CONTENT"]]:
-            self.analyze_question()
-
-    def analyze_question(self):
-        difficulty_token = self.match(self.word_category["DIFFICULTY"])
-        score_token = self.match(self.word_category["SCORE"])
-        content_token = self.match(self.word_category["CONTENT"])
-
-        difficulty = difficulty_token[1] if difficulty_token else None
-        score = int(score_token[1]) if score_token else 0
-        content = content_token[1] if content_token else ""
-
-        # 设置难度和分数的映射
-        if difficulty and self.difficulty_score_map[difficulty] is None:
-            self.difficulty_score_map[difficulty] = score
-        elif difficulty and self.difficulty_score_map[difficulty] != score:
-            self.errors.append(f"语义错误: 难度 '{difficulty}' 的题目分数应为 {self.difficulty_score_map[difficulty]}，但实际分数为 {score} at line {score_token[2] if score_token else 'unknown'}")
-
-        # 检查分数是否满足简单 < 中等 < 困难
-        if difficulty and (
-            self.difficulty_score_map["简单"] is not None and
-            self.difficulty_score_map["中等"] is not None and
-            self.difficulty_score_map["困难"] is not None
-        ):
-            if not (self.difficulty_score_map["简单"] < self.difficulty_score_map["中等"] < self.difficulty_score_map["困难"]):
-                self.errors.append(f"语义错误: 题目分数不满足 简单 < 中等 < 困难 的要求 at line {score_token[2] if score_token else 'unknown'}")
-
-        self.actual_total_score += score
-        self.actual_count += 1
-        options = self.analyze_options_or_empty()
-
-        question = (self.current_type, difficulty, f"{score}分", content) + tuple(options)
-        self.questions.append(question)
-
-    def analyze_options_or_empty(self):
-        options = []
-        has_options = False
-        while self.current_token() and self.current_token()[0] == self.word_category["OPTION"]:
-            option_token = self.match(self.word_category["OPTION"])
-            if option_token:
-                options.append(option_token[1])
-                has_options = True
-
-        # 验证题目类型是否正确包含或不包含选项
-        token = self.current_token()
-        if self.current_type in ["单选题", "多选题"] and not has_options:
-            self.errors.append(f"语义错误: 题目类型 '{self.current_type}' 应该包含选项，但没有找到选项 at line {token[2] if token else 'EOF'}")
-        if self.current_type in ["判断题", "简答题"] and has_options:
-            self.errors.append(f"语义错误: 题目类型 '{self.current_type}' 不应该包含选项，但找到了选项 at line {token[2] if token else 'EOF'}")
-        return options
-
-    def save_to_question_bank(self, filename):
-        with open(filename, 'w', encoding='utf-8') as file:
-            for question in self.questions:
-                file.write(str(question) + '\n')
-
 # GUI 部分
 def run_lexical_analysis():
     txt_display.delete(1.0, tk.END)
     filename = "./src/examples.txt"
     try:
-        questions, tokens, lex_errors = lexical_analysis(filename)
+        diagnostics = Diagnostics()
+        questions, tokens, lex_errors = lexical_analysis(filename, diagnostics)
+        diagnostics.spans.save('./output/tokens.spans')
+        diagnostics.save('./output/lexical_diagnostics.sarif')
         txt_display.insert(tk.END, "词法分析结果：\n")
         if lex_errors:
             txt_display.insert(tk.END, "\n词法分析错误：\n" + "\n".join(lex_errors) + "\n")
         else:
-            for token in tokens:
-                txt_display.insert(tk.END, f"<{token[0]}, \"{token[1]}\">\n")
+            txt_display.stream(lambda: (f"<{token[0]}, \"{token[1]}\">" for token in tokens))
         with open('./output/tokens.txt', 'w', encoding='utf-8') as f:
             for token in tokens:
                 f.write(f"<{token[0]}, \"{token[1]}\">\n")
@@ -390,7 +347,7 @@ def run_syntactical_analysis():
             txt_display.insert(tk.END, "\n语法分析错误：\n" + "\n".join(syn_errors) + "\n")
         else:
             txt_display.insert(tk.END, "\n语法分析结果：\n" + result + "\n")
-            txt_display.insert(tk.END, parsed_content + "\n")
+            txt_display.stream(lambda: parsed_content.replace("> <", ">\n<").split("\n"))
     except Exception as e:
         txt_display.insert(tk.END, f"语法分析异常：{str(e)}\n")
     btn_semantic.config(state="normal")
@@ -403,36 +360,71 @@ def run_semantic_analysis():
         txt_display.delete(1.0, tk.END)
         tokens = read_tokens_from_file(tokens_filename)
         word_category = read_word_category(word_category_filename)
-        sem_analyzer = SemanticAnalyzer(tokens, word_category)
-        sem_analyzer.analyze()
+        diagnostics = Diagnostics(SourceSpans.load('./output/tokens.spans', len(tokens)))
+        sem_analyzer = SemanticAnalyzer(tokens, word_category, diagnostics)
+        sem_analyzer.analyze_auto()
+        diagnostics.save('./output/semantic_diagnostics.sarif')
         if sem_analyzer.errors:
             txt_display.insert(tk.END, "\n语法分析错误：\n" + "\n".join(sem_analyzer.errors) + "\n")
         else:
-            sem_analyzer.save_to_question_bank(question_bank_filename)
+            sem_analyzer.save_to_question_bank(question_bank_filename, mode='upsert')
             txt_display.insert(tk.END, "语义分析完成，无错误\n")
-            with open(question_bank_filename, 'r', encoding='utf-8') as file:
-                content = file.read()
-                txt_display.insert(tk.END, content + "\n")
+            txt_display.stream(lambda: (str(question) for question in QuestionBank(question_bank_filename).load()))
 
     except Exception as e:
         txt_display.insert(tk.END, f"语义分析异常：{str(e)}\n")
 
-# 设置主窗口
-window = tk.Tk()
-window.title("分析工具")
+# 监视模式：源文件保存后在后台线程中自动重新运行三个分析阶段，并显示错误的变化
+watch_results = queue.Queue()
+watch_state = {"watcher": None}
+
+def show_watch_results():
+    while not watch_results.empty():
+        added, removed, errors = watch_results.get()
+        for error in removed:
+            txt_display.insert(tk.END, f"已修复：{error}\n")
+        for error in added:
+            txt_display.insert(tk.END, f"新错误：{error}\n")
+        txt_display.insert(tk.END, (f"共 {len(errors)} 个错误" if errors else "检查通过，无错误") + "\n")
+        txt_display.see(tk.END)
+    if watch_state["watcher"] is not None:
+        window.after(50, show_watch_results)
+
+def toggle_watch_mode():
+    from watcher import SourceWatcher
+    if watch_state["watcher"] is not None:
+        watch_state["watcher"].stop()
+        watch_state["watcher"] = None
+        btn_watch.config(text="开启监视模式")
+        return
+    txt_display.delete(1.0, tk.END)
+    txt_display.insert(tk.END, "监视模式已开启：./src/examples.txt\n")
+    watcher = SourceWatcher("./src/examples.txt", on_result=lambda *result: watch_results.put(result))
+    watch_state["watcher"] = watcher
+    threading.Thread(target=lambda: asyncio.run(watcher.run()), daemon=True).start()
+    btn_watch.config(text="关闭监视模式")
+    window.after(50, show_watch_results)
+
+if __name__ == "__main__":
+    # 设置主窗口
+    window = tk.Tk()
+    window.title("分析工具")
+
+    # 文本区域用于显示输出和错误
+    txt_display = VirtualTextView(window, width=80, height=20)
+    txt_display.grid(row=0, column=0, columnspan=3, pady=10, padx=10)
 
-# 文本区域用于显示输出和错误
-txt_display = scrolledtext.ScrolledText(window, width=80, height=20)
-txt_display.grid(row=0, column=0, columnspan=3, pady=10, padx=10)
+    # 控制工作流的按钮
+    btn_lexical = tk.Button(window, text="运行词法分析", command=run_lexical_analysis)
+    btn_lexical.grid(row=1, column=0, padx=10, pady=10)
 
-# 控制工作流的按钮
-btn_lexical = tk.Button(window, text="运行词法分析", command=run_lexical_analysis)
-btn_lexical.grid(row=1, column=0, padx=10, pady=10)
+    btn_syntax = tk.Button(window, text="运行语法分析", state="disabled", command=run_syntactical_analysis)
+    btn_syntax.grid(row=1, column=1, padx=10, pady=10)
 
-btn_syntax = tk.Button(window, text="运行语法分析", state="disabled", command=run_syntactical_analysis)
-btn_syntax.grid(row=1, column=1, padx=10, pady=10)
+    btn_semantic = tk.Button(window, text="运行语义分析", state="disabled", command=run_semantic_analysis)
+    btn_semantic.grid(row=1, column=2, padx=10, pady=10)
 
-btn_semantic = tk.Button(window, text="运行语义分析", state="disabled", command=run_semantic_analysis)
-btn_semantic.grid(row=1, column=2, padx=10, pady=10)
+    btn_watch = tk.Button(window, text="开启监视模式", command=toggle_watch_mode)
+    btn_watch.grid(row=2, column=0, columnspan=3, padx=10, pady=10)
 
-window.mainloop()
+    window.mainloop()
@@ -0,0 +1,182 @@
+import array
+import ast
+import hashlib
+import os
+import sys
+from string_pool import CompactQuestionBank
+
+# 题库的预写日志（WAL）后缀，追加导入的题目先写入日志，定期合并回题库
+WAL_SUFFIX = ".wal"
+# WAL 的大小达到题库文件的 COMPACT_RATIO 倍时自动合并（题库很小时按 COMPACT_MIN_BYTES 计算），
+# 合并的开销分摊到每条导入记录上是常数，不随题库规模增长
+COMPACT_RATIO = 0.1
+COMPACT_MIN_BYTES = 2**20
+
+# 题目元组中答案字段的前缀，答案作为最后一个元素保存在选项之后
+ANSWER_PREFIX = "答案："
+
+# 将题目元组中的选项和答案分开，返回 (选项列表, 答案)，没有答案时答案为 None
+def split_question(question):
+    rest = list(question[4:])
+    if rest and rest[-1].startswith(ANSWER_PREFIX):
+        return rest[:-1], rest[-1][len(ANSWER_PREFIX):]
+    return rest, None
+
+# 题目的身份由题型、题干和选项（不含答案）决定：题干相同、选项不同的题目（如“下列说法正确的是？”）
+# 是不同的题目，不会互相覆盖；只修改难度、分值或答案时身份不变，重新导入即更新原题
+def question_identity(question):
+    options, _ = split_question(question)
+    return "\x00".join([question[0], question[3]] + options)
+
+# 由题目身份生成稳定的题目编号，同一道题多次导入编号不变
+def question_id(question):
+    return hashlib.sha1(question_identity(question).encode('utf-8')).hexdigest()[:12]
+
+# 题型、难度、分值和选项在题库中大量重复，读取时驻留为同一个字符串对象；题干基本不重复，不做处理
+def intern_question(question):
+    return tuple(sys.intern(field) if index != 3 and isinstance(field, str) else field
+                 for index, field in enumerate(question))
+
+# 逐行读取题库格式的文件，返回 (行在文件中的字节位置, 题目)，跳过空行和无法解析的行
+def iter_question_offsets(file_path):
+    if not os.path.exists(file_path):
+        return
+    offset = 0
+    with open(file_path, 'rb') as file:
+        for raw_line in file:
+            line = raw_line.decode('utf-8').strip()
+            if line:  # 跳过空行
+                try:
+                    yield offset, intern_question(ast.literal_eval(line))
+                except (SyntaxError, ValueError) as e:
+                    print(f"Error parsing line: {line}. Error: {e}")
+            offset += len(raw_line)
+
+# 读取文件中 offset 处的一行题目
+def read_question_at(file, offset):
+    file.seek(offset)
+    return intern_question(ast.literal_eval(file.readline().decode('utf-8').strip()))
+
+def iter_question_lines(file_path):
+    for _, question in iter_question_offsets(file_path):
+        yield question
+
+def read_question_lines(file_path):
+    return list(iter_question_lines(file_path))
+
+# 查找题库文件中编号重复的题目：保留第一次出现的位置，内容换成最后一次出现的题目。
+# 返回 ({第一次出现的位置: 最后一次出现的位置}, {其余重复出现的位置})；正常的题库文件没有重复，只排序一次编号
+def find_duplicates(ids):
+    import numpy as np  # 只有紧凑读取和合并需要 NumPy，词法、语法、语义分析导入本模块时不依赖它
+    ids = np.asarray(ids)
+    order = np.argsort(ids, kind='stable')
+    sorted_ids = ids[order]
+    boundaries = np.flatnonzero(sorted_ids[1:] != sorted_ids[:-1]) + 1
+    replacements = {}
+    removed = set()
+    if len(boundaries) + 1 >= len(ids):
+        return replacements, removed
+    for group in np.split(order, boundaries):
+        if len(group) > 1:
+            replacements[int(group[0])] = int(group[-1])
+            removed.update(int(index) for index in group[1:])
+    return replacements, removed
+
+# 支持追加/更新导入的题库
+class QuestionBank:
+    def __init__(self, filename, compact_ratio=COMPACT_RATIO):
+        self.filename = filename
+        self.wal_filename = filename + WAL_SUFFIX
+        self.compact_ratio = compact_ratio
+
+    def needs_compact(self):
+        if not os.path.exists(self.wal_filename):
+            return False
+        bank_bytes = os.path.getsize(self.filename) if os.path.exists(self.filename) else 0
+        return os.path.getsize(self.wal_filename) >= self.compact_ratio * max(bank_bytes, COMPACT_MIN_BYTES)
+
+    # 追加或更新题目：只写入本次导入的题目，耗时与导入题量成正比（合并的开销按比例分摊）
+    def upsert(self, questions):
+        with open(self.wal_filename, 'a', encoding='utf-8') as file:
+            for question in questions:
+                file.write(str(question) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        if self.needs_compact():
+            self.compact()
+
+    # 读取题库并按编号应用 WAL 中的记录，返回 {题目编号: 题目}
+    def load_with_ids(self):
+        bank = {}
+        for question in read_question_lines(self.filename):
+            bank[question_id(question)] = question
+        for question in read_question_lines(self.wal_filename):
+            bank[question_id(question)] = question
+        return bank
+
+    def load(self):
+        return list(self.load_with_ids().values())
+
+    def read_wal(self):
+        wal = {}
+        for question in iter_question_lines(self.wal_filename):
+            wal[question_id(question)] = question
+        return wal
+
+    # 读取为紧凑题库，结果与 load() 相同：题目按编号第一次出现的顺序排列，编号重复时保留最后一次出现的题目。
+    # 题库文件逐行读取，只有 WAL 中的记录以题目形式留在内存中；去重用的编号以 48 位整数保存在数组中
+    # （每道题 8 字节，排序时再临时占用 16 字节），读取完成后释放
+    def load_compact(self):
+        wal = self.read_wal()
+        bank = CompactQuestionBank()
+        ids = array.array('Q')
+        applied = set()
+        for question in iter_question_lines(self.filename):
+            qid = question_id(question)
+            if qid in wal:
+                question = wal[qid]
+                applied.add(qid)
+            bank.append(question)
+            ids.append(int(qid, 16))
+        replacements, removed = find_duplicates(ids)
+        del ids
+        if removed:
+            bank = CompactQuestionBank(bank[replacements.get(index, index)] for index in range(len(bank)) if index not in removed)
+        for qid, question in wal.items():
+            if qid not in applied:
+                bank.append(question)
+        return bank
+
+    # 将 WAL 合并回题库文件，结果与 load() 相同。题库文件逐行复制，只在内存中保存 WAL 中的记录
+    # 和每道题的编号、行位置（各 8 字节）；先写临时文件再替换，避免中途失败损坏题库
+    def compact(self):
+        wal = self.read_wal()
+        ids = array.array('Q')
+        offsets = array.array('Q')
+        for offset, question in iter_question_offsets(self.filename):
+            ids.append(int(question_id(question), 16))
+            offsets.append(offset)
+        replacements, removed = find_duplicates(ids)
+        applied = set()
+        temp_filename = self.filename + ".tmp"
+        with open(temp_filename, 'w', encoding='utf-8') as file:
+            if len(ids):
+                with open(self.filename, 'rb') as source:
+                    for index in range(len(ids)):
+                        if index in removed:
+                            continue
+                        qid = f"{ids[index]:012x}"
+                        if qid in wal:
+                            applied.add(qid)
+                            file.write(str(wal[qid]) + '\n')
+                            continue
+                        source.seek(offsets[replacements.get(index, index)])
+                        file.write(source.readline().decode('utf-8').strip() + '\n')
+            for qid, question in wal.items():
+                if qid not in applied:
+                    file.write(str(question) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_filename, self.filename)
+        if os.path.exists(self.wal_filename):
+            os.remove(self.wal_filename)
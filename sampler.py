@@ -0,0 +1,172 @@
+import array
+import bisect
+import json
+import os
+import zlib
+from question_bank import question_id
+
+# 题目使用记录文件
+USAGE_STATS_FILE = "./output/usage_stats.json"
+# 题目距上次使用经过的试卷数达到该值时，近期使用带来的降权恢复一半
+RECENCY_HALF_LIFE = 5
+MIN_WEIGHT = 1e-6
+
+# 由试卷名称生成固定的随机种子，同一试卷名称在同样的使用记录下抽到同样的题目
+def paper_seed(exam_name):
+    return zlib.crc32(exam_name.encode('utf-8'))
+
+# 树状数组（Fenwick 树），支持 O(log n) 修改单个权重和按前缀和查找
+class FenwickTree:
+    def __init__(self, weights):
+        self.size = len(weights)
+        self.tree = array.array('d', [0.0])
+        self.tree.extend(float(weight) for weight in weights)
+        for index in range(1, self.size + 1):
+            parent = index + (index & -index)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[index]
+        self.total = float(sum(weights))
+
+    def add(self, index, delta):
+        self.total += delta
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    # 返回前缀和首次超过 target 的位置（从 0 开始）
+    def find(self, target):
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            next_position = position + step
+            if next_position <= self.size and self.tree[next_position] <= target:
+                position = next_position
+                target -= self.tree[next_position]
+            step >>= 1
+        return min(position, self.size - 1)
+
+# 题目使用记录：每道题被使用的次数和最近一次使用时的试卷序号，以及每份试卷的种子和题目
+class UsageStats:
+    def __init__(self, filename=USAGE_STATS_FILE):
+        self.filename = filename
+        self.paper_count = 0
+        self.questions = {}
+        self.papers = {}
+        if os.path.exists(filename):
+            with open(filename, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            self.paper_count = data["paper_count"]
+            self.questions = data["questions"]
+            self.papers = data["papers"]
+
+    # 权重 = 基础权重 × 近期系数。使用次数越多基础权重越低，最近一次使用越近近期系数越低；
+    # 从未使用过的题目两者都为 1
+    def weight(self, qid):
+        return self.base_weight(qid) * self.recency(qid)
+
+    # 基础权重只在题目被使用时改变
+    def base_weight(self, qid):
+        usage = self.questions.get(qid)
+        return 1.0 if usage is None else 1.0 / (1 + usage[0])
+
+    # 近期系数随试卷序号变化，总在 0 到 1 之间（不低于 MIN_WEIGHT 对应的值）
+    def recency(self, qid):
+        usage = self.questions.get(qid)
+        if usage is None:
+            return 1.0
+        count, last_paper = usage
+        recency = 1 - 0.5 ** ((self.paper_count - last_paper) / RECENCY_HALF_LIFE)
+        return min(max(recency, MIN_WEIGHT * (1 + count)), 1.0)
+
+    def record(self, exam_name, seed, questions):
+        self.paper_count += 1
+        qids = [question_id(question) for question in questions]
+        for qid in qids:
+            count = self.questions.get(qid, [0, 0])[0]
+            self.questions[qid] = [count + 1, self.paper_count]
+        self.papers[exam_name] = {"seed": seed, "paper": self.paper_count, "questions": qids}
+        return qids
+
+    def save(self):
+        directory = os.path.dirname(self.filename)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temp_filename = self.filename + ".tmp"
+        with open(temp_filename, 'w', encoding='utf-8') as file:
+            json.dump({"paper_count": self.paper_count, "questions": self.questions, "papers": self.papers},
+                      file, ensure_ascii=False)
+        os.replace(temp_filename, self.filename)
+
+# 抽题时连续拒绝的次数达到该值（几乎所有题目都刚用过）后，改为按精确权重直接抽取
+MAX_REJECTIONS = 64
+
+# 一种题型的抽题池，在多次抽题之间保留：只保存题目在题库中的位置和编号（编号为 48 位整数，
+# 另按编号排序一份用于查找），都放在数组中，不持有题目元组；编号只计算一次。
+# 树状数组保存各题的基础权重，题目被使用后由 record 以 O(log n) 更新。近期系数每份试卷都会变化，
+# 因此不放进树中，而是按基础权重抽取后以近期系数为概率接受（拒绝抽样），抽中每道题的概率仍与 weight 成正比
+class WeightedPool:
+    def __init__(self, bank, indices, usage):
+        self.bank = bank
+        self.indices = array.array('I', indices)
+        self.qids = array.array('Q', (int(question_id(bank[index]), 16) for index in self.indices))
+        order = sorted(range(len(self.qids)), key=self.qids.__getitem__)
+        self.sorted_qids = array.array('Q', (self.qids[position] for position in order))
+        self.sorted_positions = array.array('I', order)
+        self.weights = array.array('d', (usage.base_weight(self.qid(position)) for position in range(len(self.qids))))
+        self.tree = FenwickTree(self.weights)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def qid(self, position):
+        return f"{self.qids[position]:012x}"
+
+    # 编号对应的题目在抽题池中的位置，不在池中时返回 None
+    def position(self, qid):
+        key = int(qid, 16)
+        index = bisect.bisect_left(self.sorted_qids, key)
+        if index < len(self.sorted_qids) and self.sorted_qids[index] == key:
+            return self.sorted_positions[index]
+        return None
+
+    def find(self, qid):
+        position = self.position(qid)
+        return None if position is None else self.bank[self.indices[position]]
+
+    # 无放回地抽取 count 道题；抽中的题目暂时从树中移除，抽完后放回，不改变抽题池
+    def sample(self, count, usage, rng):
+        if count > len(self):
+            raise ValueError("Sample larger than population")
+        selected = []
+        chosen = set()
+        try:
+            while len(selected) < count:
+                position = self.draw(usage, rng, chosen)
+                self.tree.add(position, -self.weights[position])
+                selected.append(position)
+                chosen.add(position)
+        finally:
+            for position in selected:
+                self.tree.add(position, self.weights[position])
+        return [self.bank[self.indices[position]] for position in selected]
+
+    def draw(self, usage, rng, chosen):
+        for _ in range(MAX_REJECTIONS):
+            position = self.tree.find(rng.random() * self.tree.total)
+            if position in chosen:  # 浮点误差导致落在已抽走的题目上，重新抽取
+                continue
+            if rng.random() < usage.recency(self.qid(position)):
+                return position
+        remaining = [position for position in range(len(self)) if position not in chosen]
+        weights = [self.weights[position] * usage.recency(self.qid(position)) for position in remaining]
+        return rng.choices(remaining, weights)[0]
+
+    # 使用记录改变后更新这些题目的基础权重
+    def record(self, qids, usage):
+        for qid in qids:
+            position = self.position(qid)
+            if position is not None:
+                weight = usage.base_weight(qid)
+                self.tree.add(position, weight - self.weights[position])
+                self.weights[position] = weight
@@ -1,5 +1,13 @@
+import array
 import json
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from diagnostics import Diagnostics, SourceSpans
+from question_bank import ANSWER_PREFIX, QuestionBank
+
+# token 数量达到该值时使用多进程并行分析
+PARALLEL_THRESHOLD = 200000
 
 # 读取 token 文件
 def read_tokens_from_file(filename):
@@ -30,11 +38,65 @@ def get_word_category_name(word_category, token_type):
             return name
     return str(token_type)
 
+# 子进程中的 token 序列和单词类别表，进程池启动时传入一次（fork 方式下直接继承，不需要复制）
+worker_tokens = None
+worker_word_category = None
+
+def init_worker(tokens, word_category):
+    global worker_tokens, worker_word_category
+    worker_tokens = tokens
+    worker_word_category = word_category
+
+# 每道题在 question_records 中占 QUESTION_RECORD_SIZE 个整数：题型、难度、分值、题干、选项起止、答案的 token 位置，缺少时为 -1
+QUESTION_RECORD_SIZE = 7
+
+# 根据分析结果生成题目元组
+def build_question(current_type, difficulty, score, content, options, answer):
+    question = (current_type, difficulty, f"{score}分", content) + tuple(options)
+    if answer:
+        question += (ANSWER_PREFIX + answer,)
+    return question
+
+# 由 token 位置还原题目元组，与 analyze_question 生成的题目相同
+def questions_from_records(tokens, records):
+    questions = []
+    for type_index, difficulty_index, score_index, content_index, option_start, option_end, answer_index \
+            in zip(*[iter(records)] * QUESTION_RECORD_SIZE):
+        questions.append(build_question(tokens[type_index][1],
+                                        tokens[difficulty_index][1] if difficulty_index >= 0 else None,
+                                        int(tokens[score_index][1]) if score_index >= 0 else 0,
+                                        tokens[content_index][1] if content_index >= 0 else "",
+                                        [token[1] for token in tokens[option_start:option_end]],
+                                        tokens[answer_index][1] if answer_index >= 0 else None))
+    return questions
+
+# 在子进程中分析从 [start, end) 内开始的各个部分（第一个 TYPE token 之前的内容属于上一段）。
+# 只把题目的 token 位置和错误的原始信息传回主进程；同时返回第一部分的起始位置和分析结束的位置，
+# 主进程据此检查各段是否正好首尾相接
+def analyze_section_range(start, end):
+    type_token = worker_word_category["TYPE"]
+    if start > 0:
+        while start < len(worker_tokens) and worker_tokens[start][0] != type_token:
+            start += 1
+    analyzer = SemanticAnalyzer(worker_tokens, worker_word_category)
+    analyzer.deferred_errors = []
+    analyzer.question_records = array.array('i')
+    analyzer.index = start
+    while analyzer.index < end:
+        analyzer.analyze_section()
+    return start, analyzer.index, analyzer.question_records, analyzer.deferred_errors
+
 # 语义分析器类
 class SemanticAnalyzer:
-    def __init__(self, tokens, word_category):
+    def __init__(self, tokens, word_category, diagnostics=None):
         self.tokens = tokens
         self.word_category = word_category
+        self.diagnostics = diagnostics
+        # 不为 None 时只记录错误的原始信息，由并行分析的主进程统一生成错误信息
+        self.deferred_errors = None
+        # 不为 None 时不生成题目元组，只记录题目各部分的 token 位置（见 QUESTION_RECORD_SIZE）
+        self.question_records = None
+        self.type_index = -1
         self.index = 0
         self.current_type = None
         self.expected_count = 0
@@ -54,6 +116,19 @@ class SemanticAnalyzer:
             return self.tokens[self.index]
         return None
 
+    # 记录语义错误。有源文件位置信息时报告试卷源文件中的行号，否则报告 tokens 文件中的行号
+    def report_error(self, message, token, missing='EOF'):
+        if self.deferred_errors is not None:
+            self.deferred_errors.append((message, token, missing))
+            return
+        location = token[2] - 1 if token else None
+        line = self.diagnostics.line_of(location) if self.diagnostics else None
+        if line is None:
+            line = token[2] if token else missing
+        self.errors.append(f"{message} at line {line}")
+        if self.diagnostics:
+            self.diagnostics.add("semantic", self.errors[-1], location)
+
     def match(self, expected_type):
         token = self.current_token()
         if token and token[0] == expected_type:
@@ -65,31 +140,72 @@ class SemanticAnalyzer:
 
     def analyze(self):
         while self.current_token():
-            self.current_type = self.match(self.word_category["TYPE"])[1]
-            self.expected_count = int(self.match(self.word_category["COUNT"])[1])
-            self.expected_total_score = int(self.match(self.word_category["TOTAL SCORE"])[1])
-            self.actual_count = 0
-            self.actual_total_score = 0
-            self.difficulty_score_map = {
-                "简单": None,
-                "中等": None,
-                "困难": None
-            }
-            self.analyze_question_list()
-
-            # 验证题目数量和总分数
-            if self.actual_count != self.expected_count:
-                current_token = self.current_token()
-                self.errors.append(f"语义错误: 预期题目数量 {self.expected_count}, 但实际数量为 {self.actual_count} at line {current_token[2] if current_token else 'EOF'}")
-            if self.actual_total_score != self.expected_total_score:
-                current_token = self.current_token()
-                self.errors.append(f"语义错误: 预期总分数 {self.expected_total_score}, 但实际分数为 {self.actual_total_score} at line {current_token[2] if current_token else 'EOF'}")
+            self.analyze_section()
+
+    # 分析一个“第X部分”：题型、题量、总分及其下的全部题目
+    def analyze_section(self):
+        self.type_index = self.index
+        self.current_type = self.match(self.word_category["TYPE"])[1]
+        self.expected_count = int(self.match(self.word_category["COUNT"])[1])
+        self.expected_total_score = int(self.match(self.word_category["TOTAL SCORE"])[1])
+        self.actual_count = 0
+        self.actual_total_score = 0
+        self.difficulty_score_map = {
+            "简单": None,
+            "中等": None,
+            "困难": None
+        }
+        self.analyze_question_list()
+
+        # 验证题目数量和总分数
+        if self.actual_count != self.expected_count:
+            current_token = self.current_token()
+            self.report_error(f"语义错误: 预期题目数量 {self.expected_count}, 但实际数量为 {self.actual_count}", current_token)
+        if self.actual_total_score != self.expected_total_score:
+            current_token = self.current_token()
+            self.report_error(f"语义错误: 预期总分数 {self.expected_total_score}, 但实际分数为 {self.actual_total_score}", current_token)
+
+    # 并行分析：把 token 序列平均分为若干段，由多个进程同时分析各段中的部分，再按源文件顺序合并题目和错误。
+    # token 序列在进程池启动时交给子进程，任务只传递段的起止位置，部分的边界由子进程自己查找。
+    # 各部分的检查互不依赖；只有格式错误的 token 序列才会使某一部分越过下一部分的开头或抛出异常，
+    # 这时改为顺序分析，因此结果（包括抛出的异常）总是与 analyze() 一致
+    def analyze_parallel(self, max_workers=None):
+        max_workers = max_workers or os.cpu_count() or 1
+        if max_workers == 1:
+            self.analyze()
+            return
+        chunk_count = max_workers * 4
+        bounds = [len(self.tokens) * index // chunk_count for index in range(chunk_count + 1)]
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                                     initargs=(self.tokens, self.word_category)) as executor:
+                futures = [executor.submit(analyze_section_range, start, end) for start, end in zip(bounds, bounds[1:])]
+                results = [future.result() for future in futures]
+        except Exception:
+            results = None
+        starts = [result[0] for result in results[1:]] + [len(self.tokens)] if results else None
+        if results is None or any(result[1] != start for result, start in zip(results, starts)):
+            self.analyze()
+            return
+        for _, _, records, error_records in results:
+            self.questions += questions_from_records(self.tokens, records)
+            for record in error_records:
+                self.report_error(*record)
+        self.index = len(self.tokens)
+
+    # token 数量达到 PARALLEL_THRESHOLD 时并行分析，否则顺序分析；两者的结果相同
+    def analyze_auto(self):
+        if len(self.tokens) >= PARALLEL_THRESHOLD:
+            self.analyze_parallel()
+        else:
+            self.analyze()
 
     def analyze_question_list(self):
         while self.current_token() and self.current_token()[0] in [self.word_category["DIFFICULTY"], self.word_category["SCORE"], self.word_category["CONTENT"]]:
             self.analyze_question()
 
     def analyze_question(self):
+        first_index = self.index
         difficulty_token = self.match(self.word_category["DIFFICULTY"])
         score_token = self.match(self.word_category["SCORE"])
         content_token = self.match(self.word_category["CONTENT"])
@@ -102,7 +218,7 @@ class SemanticAnalyzer:
         if difficulty and self.difficulty_score_map[difficulty] is None:
             self.difficulty_score_map[difficulty] = score
         elif difficulty and self.difficulty_score_map[difficulty] != score:
-            self.errors.append(f"语义错误: 难度 '{difficulty}' 的题目分数应为 {self.difficulty_score_map[difficulty]}，但实际分数为 {score} at line {score_token[2] if score_token else 'unknown'}")
+            self.report_error(f"语义错误: 难度 '{difficulty}' 的题目分数应为 {self.difficulty_score_map[difficulty]}，但实际分数为 {score}", score_token, missing='unknown')
 
         # 检查分数是否满足简单 < 中等 < 困难
         if difficulty and (
@@ -111,14 +227,23 @@ class SemanticAnalyzer:
             self.difficulty_score_map["困难"] is not None
         ):
             if not (self.difficulty_score_map["简单"] < self.difficulty_score_map["中等"] < self.difficulty_score_map["困难"]):
-                self.errors.append(f"语义错误: 题目分数不满足 简单 < 中等 < 困难 的要求 at line {score_token[2] if score_token else 'unknown'}")
+                self.report_error("语义错误: 题目分数不满足 简单 < 中等 < 困难 的要求", score_token, missing='unknown')
 
         self.actual_total_score += score
         self.actual_count += 1
         options = self.analyze_options_or_empty()
+        option_end = self.index
+        answer = self.analyze_answer(options)
 
-        question = (self.current_type, difficulty, f"{score}分", content) + tuple(options)
-        self.questions.append(question)
+        if self.question_records is not None:
+            self.question_records.extend((self.type_index,
+                                          first_index if difficulty_token else -1,
+                                          first_index + 1 if score_token else -1,
+                                          first_index + 2 if content_token else -1,
+                                          first_index + 3, option_end,
+                                          option_end if answer is not None else -1))
+            return
+        self.questions.append(build_question(self.current_type, difficulty, score, content, options, answer))
 
     def analyze_options_or_empty(self):
         options = []
@@ -132,31 +257,54 @@ class SemanticAnalyzer:
         # 验证题目类型是否正确包含或不包含选项
         token = self.current_token()
         if self.current_type in ["单选题", "多选题"] and not has_options:
-            self.errors.append(f"语义错误: 题目类型 '{self.current_type}' 应该包含选项，但没有找到选项 at line {token[2] if token else 'EOF'}")
+            self.report_error(f"语义错误: 题目类型 '{self.current_type}' 应该包含选项，但没有找到选项", token)
         if self.current_type in ["判断题", "简答题"] and has_options:
-            self.errors.append(f"语义错误: 题目类型 '{self.current_type}' 不应该包含选项，但找到了选项 at line {token[2] if token else 'EOF'}")
+            self.report_error(f"语义错误: 题目类型 '{self.current_type}' 不应该包含选项，但找到了选项", token)
         return options
 
-    def save_to_question_bank(self, filename):
+    # 读取可选的答案，选择题的答案必须是已有的选项字母
+    def analyze_answer(self, options):
+        token = self.current_token()
+        if not token or token[0] != self.word_category["ANSWER"]:
+            return None
+        answer_token = self.match(self.word_category["ANSWER"])
+        answer = answer_token[1]
+        if self.current_type in ["单选题", "多选题"]:
+            labels = {option.split("、", 1)[0] for option in options}
+            letters = re.findall(r'[A-Z]', answer.upper())
+            if not letters or any(letter not in labels for letter in letters):
+                self.report_error(f"语义错误: 答案 '{answer}' 不是该题的有效选项", answer_token)
+            elif self.current_type == "单选题" and len(letters) != 1:
+                self.report_error(f"语义错误: 单选题的答案只能包含一个选项，但实际答案为 '{answer}'", answer_token)
+        return answer
+
+    # mode 为 'w' 时覆盖题库；为 'upsert' 时按题目编号追加或更新，保留已有题目
+    def save_to_question_bank(self, filename, mode='w'):
+        if mode == 'upsert':
+            QuestionBank(filename).upsert(self.questions)
+            return
         with open(filename, 'w', encoding='utf-8') as file:
             for question in self.questions:
                 file.write(str(question) + '\n')
 
 
 # 示例用法
-tokens_filename = "./output/tokens.txt"
-word_category_filename = "word_category.json"
-question_bank_filename = "./output/QuestionBank.txt"
-
-tokens = read_tokens_from_file(tokens_filename)
-word_category = read_word_category(word_category_filename)
-
-analyzer = SemanticAnalyzer(tokens, word_category)
-analyzer.analyze()
-
-if analyzer.errors:
-    for error in analyzer.errors:
-        print(error)
-else:
-    analyzer.save_to_question_bank(question_bank_filename)
-    print("语义分析完成，无错误")
+if __name__ == "__main__":
+    tokens_filename = "./output/tokens.txt"
+    word_category_filename = "word_category.json"
+    question_bank_filename = "./output/QuestionBank.txt"
+
+    tokens = read_tokens_from_file(tokens_filename)
+    word_category = read_word_category(word_category_filename)
+
+    diagnostics = Diagnostics(SourceSpans.load("./output/tokens.spans", len(tokens)))
+    analyzer = SemanticAnalyzer(tokens, word_category, diagnostics)
+    analyzer.analyze_auto()
+    diagnostics.save("./output/semantic_diagnostics.sarif")
+
+    if analyzer.errors:
+        for error in analyzer.errors:
+            print(error)
+    else:
+        analyzer.save_to_question_bank(question_bank_filename, mode='upsert')
+        print("语义分析完成，无错误")
@@ -0,0 +1,293 @@
+import array
+import json
+import os
+import random
+import zipfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from question_bank import WAL_SUFFIX, QuestionBank, find_duplicates, iter_question_offsets, question_id, read_question_at
+from analytics import build_columns, merge_statistics, partial_statistics
+
+# 分片题库目录中的清单文件，记录分片方式和分片数量
+MANIFEST_FILENAME = "shards.json"
+# 分片的行位置索引文件后缀
+SHARD_INDEX_SUFFIX = ".idx.npz"
+question_types = ['单选题', '多选题', '判断题', '简答题']
+
+def question_type(question):
+    return question[0].strip("（").strip()
+
+# 分片文件及其 WAL 的修改时间和大小，任一变化都说明分片内容已改变
+def shard_signature(path):
+    signature = []
+    for filename in (path, path + WAL_SUFFIX):
+        try:
+            stat = os.stat(filename)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+# 分片的行位置索引：按 load() 的顺序记录分片中每道题的题型编号、所在文件（0 为分片文件，1 为 WAL）、
+# 行的字节位置和题目编号（48 位整数），抽题和按编号查找时只读取用到的行。索引保存在分片旁的文件中，
+# 并记录建立时的分片签名，分片或 WAL 改变后第一次使用时重建；各子进程和以后的运行共用同一个索引文件
+def signature_array(signature):
+    return np.array([value for item in signature for value in (item or (-1, -1))], dtype=np.int64)
+
+def build_shard_index(path):
+    signature = shard_signature(path)
+    type_names = []
+
+    def type_code(question):
+        qtype = question_type(question)
+        if qtype not in type_names:
+            type_names.append(qtype)
+        return type_names.index(qtype)
+
+    wal = {}
+    for offset, question in iter_question_offsets(path + WAL_SUFFIX):
+        wal[int(question_id(question), 16)] = (offset, type_code(question))
+    ids, offsets, types = array.array('Q'), array.array('Q'), array.array('B')
+    for offset, question in iter_question_offsets(path):
+        ids.append(int(question_id(question), 16))
+        offsets.append(offset)
+        types.append(type_code(question))
+    replacements, removed = find_duplicates(ids)
+
+    index = {name: array.array(typecode) for name, typecode in
+             [("types", 'B'), ("sources", 'B'), ("offsets", 'Q'), ("qids", 'Q')]}
+
+    def add(code, source, offset, qid):
+        index["types"].append(code)
+        index["sources"].append(source)
+        index["offsets"].append(offset)
+        index["qids"].append(qid)
+
+    # 题目顺序和取值与 load() 相同：WAL 中的记录替换分片中的同一道题，其余按 WAL 中的顺序排在最后
+    for position, qid in enumerate(ids):
+        if position in removed:
+            continue
+        if qid in wal:
+            offset, code = wal.pop(qid)
+            add(code, 1, offset, qid)
+        else:
+            add(types[position], 0, offsets[replacements.get(position, position)], qid)
+    for qid, (offset, code) in wal.items():
+        add(code, 1, offset, qid)
+
+    index = {name: np.asarray(values) for name, values in index.items()}
+    index["type_names"] = np.array(type_names, dtype=str)
+    index["signature"] = signature_array(signature)
+    temp_filename = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(temp_filename, **index)
+    os.replace(temp_filename, path + SHARD_INDEX_SUFFIX)
+    return index
+
+def load_shard_index(path):
+    try:
+        with np.load(path + SHARD_INDEX_SUFFIX) as data:
+            if np.array_equal(data["signature"], signature_array(shard_signature(path))):
+                return {name: data[name] for name in data.files}
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        pass
+    return build_shard_index(path)
+
+# 某题型的题目在索引中的位置
+def type_positions(index, qtype):
+    codes = np.flatnonzero(index["type_names"] == qtype)
+    if not len(codes):
+        return np.zeros(0, dtype=np.int64)
+    return np.flatnonzero(index["types"] == codes[0])
+
+# 按索引位置读取题目，只打开、读取用到的行
+def read_indexed_questions(path, index, positions):
+    files = {}
+    try:
+        questions = []
+        for position in positions:
+            source = int(index["sources"][position])
+            if source not in files:
+                files[source] = open(path + WAL_SUFFIX if source else path, 'rb')
+            questions.append(read_question_at(files[source], int(index["offsets"][position])))
+        return questions
+    finally:
+        for file in files.values():
+            file.close()
+
+# 以下函数在子进程中执行，每次只处理一个分片文件
+def shard_count_by_type(filename):
+    index = load_shard_index(filename)
+    counts = np.bincount(index["types"], minlength=len(index["type_names"]))
+    return {str(qtype): int(count) for qtype, count in zip(index["type_names"], counts) if count}
+
+# 分片的部分统计，只把计数结果传回主进程
+def shard_statistics(filename):
+    return partial_statistics(build_columns(QuestionBank(filename).load()))
+
+def shard_load(filename):
+    return QuestionBank(filename).load()
+
+def shard_search(filename, keyword):
+    return [question for question in QuestionBank(filename).load() if any(keyword in field for field in question[3:])]
+
+# 按权重无放回地抽取分片中某题型的 count 道题（Efraimidis–Spirakis 加权抽样）：每道题的键为 log(u) / 权重，
+# u 为 (0, 1) 间的随机数，键最大的 count 道题即按权重依次抽出的结果。used_qids、used_weights 为用过的题目的编号和权重，
+# 其余题目权重为 1。返回 [(键, 题目), ...]，主进程合并各分片的结果后取键最大的 count 道
+def shard_weighted_pick(filename, qtype, count, seed, used_qids, used_weights):
+    index = load_shard_index(filename)
+    positions = type_positions(index, qtype)
+    weights = np.ones(len(positions))
+    if len(used_qids) and len(positions):
+        order = np.argsort(used_qids)
+        sorted_qids = used_qids[order]
+        qids = index["qids"][positions]
+        found = np.minimum(np.searchsorted(sorted_qids, qids), len(sorted_qids) - 1)
+        matched = sorted_qids[found] == qids
+        weights[matched] = used_weights[order][found[matched]]
+    keys = np.log(np.random.default_rng(seed).random(len(positions))) / weights
+    top = np.argsort(-keys, kind='stable')[:count]
+    return list(zip(keys[top].tolist(), read_indexed_questions(filename, index, positions[top])))
+
+# 按题目编号查找分片中的题目，返回 {题目编号: 题目}
+def shard_find(filename, qids):
+    index = load_shard_index(filename)
+    positions = np.flatnonzero(np.isin(index["qids"], np.array([int(qid, 16) for qid in qids], dtype=np.uint64)))
+    questions = read_indexed_questions(filename, index, positions)
+    return {f"{int(index['qids'][position]):012x}": question for position, question in zip(positions, questions)}
+
+# 分片题库：按题型或按题目编号的哈希把题目分散到多个文件中，
+# 统计、搜索和抽题请求由进程池分发到各分片并行执行后再合并结果
+class ShardedQuestionBank:
+    def __init__(self, directory, max_workers=None):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILENAME), 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+        self.shard_by = manifest["shard_by"]
+        self.shard_names = manifest["shards"]
+        self.max_workers = max_workers
+        self.executor = None
+        # 各分片的题量和部分统计缓存，{分片路径: (分片签名, 结果)}
+        self.counts_cache = {}
+        self.statistics_cache = {}
+
+    # 新建分片题库目录，shard_by 为 'type'（每种题型一个分片）或 'hash'（按题目编号哈希分为 shard_count 片）
+    @classmethod
+    def create(cls, directory, shard_by='type', shard_count=8, max_workers=None):
+        if shard_by == 'type':
+            shard_names = [f"type_{qtype}.txt" for qtype in question_types]
+        elif shard_by == 'hash':
+            shard_names = [f"hash_{index:03d}.txt" for index in range(shard_count)]
+        else:
+            raise ValueError(f"Unknown shard_by: {shard_by}")
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(os.path.join(directory, MANIFEST_FILENAME), 'w', encoding='utf-8') as file:
+            json.dump({"shard_by": shard_by, "shards": shard_names}, file, ensure_ascii=False, indent=4)
+        return cls(directory, max_workers)
+
+    def shard_paths(self):
+        return [os.path.join(self.directory, name) for name in self.shard_names]
+
+    def shard_for(self, question):
+        if self.shard_by == 'type':
+            qtype = question_type(question)
+            if qtype not in question_types:
+                raise ValueError(f"Unknown question type: {qtype}")
+            index = question_types.index(qtype)
+        else:
+            index = int(question_id(question), 16) % len(self.shard_names)
+        return self.shard_paths()[index]
+
+    def get_executor(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self.executor
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    # 按分片路由后追加/更新题目，每个分片只写入属于自己的题目
+    def upsert(self, questions):
+        routed = {}
+        for question in questions:
+            routed.setdefault(self.shard_for(question), []).append(question)
+        for path, shard_questions in routed.items():
+            QuestionBank(path).upsert(shard_questions)
+
+    # 在各分片上执行 function，只有内容改变过的分片才重新读取，其余直接使用缓存的结果
+    def map_cached(self, function, cache):
+        paths = self.shard_paths()
+        signatures = [shard_signature(path) for path in paths]
+        stale = [index for index, path in enumerate(paths) if path not in cache or cache[path][0] != signatures[index]]
+        if stale:
+            results = self.get_executor().map(function, [paths[index] for index in stale])
+            for index, result in zip(stale, results):
+                cache[paths[index]] = (signatures[index], result)
+        return [cache[path][1] for path in paths]
+
+    # 各分片每种题型的题量，返回 [{题型: 题量}, ...]，顺序与分片顺序一致
+    def shard_counts(self):
+        return self.map_cached(shard_count_by_type, self.counts_cache)
+
+    # 题库统计由各分片在子进程中计算后合并，不把题目传回主进程
+    def statistics(self):
+        return merge_statistics(self.map_cached(shard_statistics, self.statistics_cache))
+
+    def count_by_type(self):
+        counts = {}
+        for shard in self.shard_counts():
+            for qtype, count in shard.items():
+                counts[qtype] = counts.get(qtype, 0) + count
+        return counts
+
+    def search(self, keyword):
+        paths = self.shard_paths()
+        results = []
+        for shard_results in self.get_executor().map(shard_search, paths, [keyword] * len(paths)):
+            results += shard_results
+        return results
+
+    # 以下 count_by_type、statistics、sample、record_usage、find_questions 与紧凑题库
+    # （string_pool.CompactQuestionBank）相同，界面不需要区分两种题库
+
+    # 按使用记录加权，从全部分片中无放回地抽取 count 道某题型的题目，抽中每道题的概率与 usage.weight 成正比
+    # （与紧凑题库相同）。各分片在子进程中为自己的题目计算键，主进程只传入用过的题目的权重
+    def sample(self, qtype, count, usage, rng=random):
+        shard_totals = [shard.get(qtype, 0) for shard in self.shard_counts()]
+        if count > sum(shard_totals):
+            raise ValueError("Sample larger than population")
+        seed = rng.getrandbits(64)
+        used_qids = np.array([int(qid, 16) for qid in usage.questions], dtype=np.uint64)
+        used_weights = np.array([usage.weight(qid) for qid in usage.questions], dtype=np.float64)
+        paths = self.shard_paths()
+        futures = [self.get_executor().submit(shard_weighted_pick, paths[shard_index], qtype, count,
+                                              [seed, shard_index], used_qids, used_weights)
+                   for shard_index, total in enumerate(shard_totals) if total > 0]
+        candidates = []
+        for future in futures:
+            candidates += future.result()
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        return [question for _, question in candidates[:count]]
+
+    # 权重在抽题时由使用记录计算，使用记录改变后不需要更新
+    def record_usage(self, qids, usage):
+        pass
+
+    # 按题目编号查找题目，返回 {题目编号: 题目}，找不到的编号不出现在结果中
+    def find_questions(self, qids, usage=None):
+        qids = list(qids)
+        paths = self.shard_paths()
+        found = {}
+        for shard_found in self.get_executor().map(shard_find, paths, [qids] * len(paths)):
+            found.update(shard_found)
+        return found
+
+    # 支持 len() 和遍历；遍历会把全部题目传回主进程，界面中的题量和统计改用 count_by_type 和 statistics
+    def __len__(self):
+        return sum(self.count_by_type().values())
+
+    def __iter__(self):
+        for shard_questions in self.get_executor().map(shard_load, self.shard_paths()):
+            yield from shard_questions
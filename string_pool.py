@@ -0,0 +1,180 @@
+import array
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+
+# 字符串池：相同的字符串只保存一份，用整数编码引用
+class StringPool:
+    def __init__(self):
+        self.codes = {}
+        self.strings = []
+
+    def intern(self, string):
+        code = self.codes.get(string)
+        if code is None:
+            code = len(self.strings)
+            self.codes[string] = code
+            self.strings.append(string)
+        return code
+
+    def get(self, code):
+        return self.strings[code]
+
+    def __len__(self):
+        return len(self.strings)
+
+# 紧凑的题库：题型、难度、分值用整数编码保存在数组中，选项（含答案字段）放入共享的字符串池，
+# 每道题只单独保存题干。可以像题目列表一样使用 len()、下标和遍历，取出的题目元组中
+# 重复的字符串都是同一个对象
+class CompactQuestionBank:
+    def __init__(self, questions=()):
+        self.types = StringPool()
+        self.difficulties = StringPool()
+        self.scores = StringPool()
+        self.options = StringPool()
+        self.type_codes = array.array('B')
+        self.difficulty_codes = array.array('B')
+        self.score_codes = array.array('H')
+        self.contents = []
+        # 第 i 道题的选项编码为 option_codes[option_offsets[i]:option_offsets[i + 1]]
+        self.option_offsets = array.array('I', [0])
+        self.option_codes = array.array('I')
+        self.pools = None
+        for question in questions:
+            self.append(question)
+
+    def append(self, question):
+        self.type_codes.append(self.types.intern(question[0]))
+        self.difficulty_codes.append(self.difficulties.intern(question[1]))
+        self.score_codes.append(self.scores.intern(question[2]))
+        self.contents.append(question[3])
+        self.option_codes.extend(self.options.intern(option) for option in question[4:])
+        self.option_offsets.append(len(self.option_codes))
+
+    def __len__(self):
+        return len(self.contents)
+
+    # 以下 count_by_type、statistics、sample、record_usage、find_questions 与分片题库
+    # （sharded_bank.ShardedQuestionBank）相同，界面不需要区分两种题库。
+    # analytics 和 sampler 经 question_bank 依赖本模块，因此在方法中导入
+
+    # 题型编码对应的题型名称（去掉可能存在的括号）
+    def type_names(self):
+        return [qtype.strip("（").strip() for qtype in self.types.strings]
+
+    # 按题型编码计数，不还原题目元组，返回 {题型: 题数}
+    def count_by_type(self):
+        names = self.type_names()
+        counts = {}
+        for code in self.type_codes:
+            counts[names[code]] = counts.get(names[code], 0) + 1
+        return counts
+
+    def statistics(self):
+        from analytics import build_columns, compute_statistics
+        return compute_statistics(build_columns(self))
+
+    # 每种题型一个抽题池（见 sampler.WeightedPool），第一次抽题时建立，之后由 record_usage 更新
+    def weighted_pools(self, usage):
+        from sampler import WeightedPool
+        if self.pools is None:
+            names = self.type_names()
+            indices = {}
+            for index, code in enumerate(self.type_codes):
+                indices.setdefault(names[code], []).append(index)
+            self.pools = {qtype: WeightedPool(self, type_indices, usage) for qtype, type_indices in indices.items()}
+        return self.pools
+
+    # 按使用记录加权，无放回地抽取 count 道某题型的题目
+    def sample(self, qtype, count, usage, rng):
+        pool = self.weighted_pools(usage).get(qtype)
+        if pool is None:
+            raise ValueError("Sample larger than population")
+        return pool.sample(count, usage, rng)
+
+    # 使用记录改变后更新抽题池中这些题目的权重
+    def record_usage(self, qids, usage):
+        for pool in self.weighted_pools(usage).values():
+            pool.record(qids, usage)
+
+    # 按题目编号查找题目，返回 {题目编号: 题目}，找不到的编号不出现在结果中；usage 用于建立抽题池
+    def find_questions(self, qids, usage):
+        found = {}
+        for qid in qids:
+            for pool in self.weighted_pools(usage).values():
+                question = pool.find(qid)
+                if question is not None:
+                    found[qid] = question
+                    break
+        return found
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        options = self.option_codes[self.option_offsets[index]:self.option_offsets[index + 1]]
+        return (self.types.get(self.type_codes[index]),
+                self.difficulties.get(self.difficulty_codes[index]),
+                self.scores.get(self.score_codes[index]),
+                self.contents[index]) + tuple(self.options.get(code) for code in options)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+# 生成 question_count 道题的模拟题库：题干各不相同，选项从常见选项中抽取
+def synthetic_questions(question_count, seed=0):
+    rng = random.Random(seed)
+    common_options = ["A、1", "B、2", "C、3", "D、4", "A、正确", "B、错误", "D、以上答案均正确", "D、以上答案均不正确"]
+    questions = []
+    for index in range(question_count):
+        qtype = rng.choice(['单选题', '多选题', '判断题', '简答题'])
+        difficulty = rng.choice(['简单', '中等', '困难'])
+        question = (qtype, difficulty, f"{rng.randint(1, 10)}分", f"第{index}题的题干内容")
+        if qtype in ['单选题', '多选题']:
+            question += tuple(rng.choice(common_options) for _ in range(4))
+        # 模拟从文件读取：每个字段都是独立的字符串对象
+        questions.append(tuple(''.join(list(field)) for field in question))
+    return questions
+
+# 测量三种方式保存 question_count 道题占用的内存（字节）：
+# 普通题目列表、驻留重复字段后的题目列表、紧凑题库
+def measure_memory(question_count):
+    results = []
+    for build in [
+        lambda questions: questions,
+        lambda questions: [tuple(sys.intern(field) if index != 3 else field for index, field in enumerate(question))
+                           for question in questions],
+        CompactQuestionBank,
+    ]:
+        tracemalloc.start()
+        bank = build(synthetic_questions(question_count))
+        results.append(tracemalloc.get_traced_memory()[0])
+        tracemalloc.stop()
+        del bank
+    return results
+
+# 测量 QuestionBank.load_compact() 读取 question_count 道题的题库文件占用的内存（字节），
+# 返回 (读取完成后保留的内存, 读取过程中的峰值内存)，峰值包含去重用的编号数组
+def measure_load_compact(question_count):
+    from question_bank import QuestionBank  # question_bank 依赖本模块，在这里导入以免循环导入
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "QuestionBank.txt")
+        with open(filename, 'w', encoding='utf-8') as file:
+            for question in synthetic_questions(question_count):
+                file.write(str(question) + '\n')
+        tracemalloc.start()
+        bank = QuestionBank(filename).load_compact()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del bank
+    return current, peak
+
+if __name__ == "__main__":
+    question_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    list_bytes, interned_bytes, compact_bytes = measure_memory(question_count)
+    load_bytes, load_peak_bytes = measure_load_compact(question_count)
+    print(f"{question_count} 道题：题目列表 {list_bytes / 2**20:.1f} MB，"
+          f"驻留后 {interned_bytes / 2**20:.1f} MB，紧凑题库 {compact_bytes / 2**20:.1f} MB，"
+          f"load_compact 读取后 {load_bytes / 2**20:.1f} MB（峰值 {load_peak_bytes / 2**20:.1f} MB，含去重编号）")
@@ -0,0 +1,147 @@
+import queue
+import threading
+import tkinter as tk
+from tkinter import font as tkfont
+
+# 每批从后台线程传给界面的行数，以及界面每次轮询最多处理的批数
+STREAM_CHUNK_LINES = 1000
+STREAM_CHUNKS_PER_POLL = 20
+STREAM_POLL_MS = 30
+
+# 虚拟化文本显示区：所有行保存在列表中，文本框里只放当前可见的几十行，
+# 因此显示几十万行结果时插入和滚动的开销都与总行数无关。
+# 提供与 ScrolledText 相同的 insert/delete/see 用法，原有的显示代码无需修改
+class VirtualTextView(tk.Frame):
+    def __init__(self, master, width=80, height=20):
+        super().__init__(master)
+        self.lines = []
+        self.top = 0
+        self.follow = True
+        self.stream_queue = queue.Queue()
+        self.stream_generation = 0
+        self.stream_threads = []
+        self.polling = False
+
+        self.text = tk.Text(self, width=width, height=height, wrap="none")
+        self.yscrollbar = tk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.xscrollbar = tk.Scrollbar(self, orient="horizontal", command=self.text.xview)
+        self.text.config(xscrollcommand=self.xscrollbar.set)
+        self.text.grid(row=0, column=0, sticky="nsew")
+        self.yscrollbar.grid(row=0, column=1, sticky="ns")
+        self.xscrollbar.grid(row=1, column=0, sticky="ew")
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.line_height = tkfont.Font(font=self.text['font']).metrics('linespace')
+        self.text.bind("<Configure>", lambda event: self.render())
+        self.text.bind("<MouseWheel>", lambda event: self.scroll_by(-1 if event.delta > 0 else 1, "units"))
+        self.text.bind("<Button-4>", lambda event: self.scroll_by(-1, "units"))
+        self.text.bind("<Button-5>", lambda event: self.scroll_by(1, "units"))
+
+    def visible_rows(self):
+        height = self.text.winfo_height()
+        if height <= 1:
+            return int(self.text['height'])
+        return max(1, height // self.line_height)
+
+    # 只把可见范围内的行一次性写入文本框
+    def render(self):
+        rows = self.visible_rows()
+        self.top = max(0, min(self.top, len(self.lines) - rows))
+        self.text.config(state="normal")
+        self.text.delete(1.0, tk.END)
+        self.text.insert(tk.END, "\n".join(self.lines[self.top:self.top + rows]))
+        self.text.config(state="disabled")
+        if self.lines:
+            self.yscrollbar.set(self.top / len(self.lines), min(1.0, (self.top + rows) / len(self.lines)))
+        else:
+            self.yscrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, top):
+        rows = self.visible_rows()
+        self.top = max(0, min(top, len(self.lines) - rows))
+        self.follow = self.top >= len(self.lines) - rows
+        self.render()
+
+    def scroll_by(self, count, what):
+        step = self.visible_rows() if what == "pages" else 1
+        self.scroll_to(self.top + count * step)
+        return "break"
+
+    # 滚动条回调
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.lines)))
+        elif args[0] == "scroll":
+            self.scroll_by(int(args[1]), args[2])
+
+    def append_lines(self, lines):
+        self.lines.extend(lines)
+        if self.follow:
+            self.top = len(self.lines) - self.visible_rows()
+        self.render()
+
+    # 与 ScrolledText 兼容的接口
+    def insert(self, index, text):
+        new_lines = text.split("\n")
+        if self.lines:
+            self.lines[-1] += new_lines.pop(0)
+        self.append_lines(new_lines)
+
+    def delete(self, start, end=None):
+        self.stream_generation += 1
+        self.lines = []
+        self.top = 0
+        self.follow = True
+        self.render()
+
+    def see(self, index):
+        self.follow = True
+        self.scroll_to(len(self.lines))
+
+    # 在后台线程中运行 produce()（返回可迭代的行），按批把结果传回界面显示；
+    # 调用 delete 后尚未显示的旧结果会被丢弃
+    def stream(self, produce):
+        generation = self.stream_generation
+
+        def worker():
+            chunk = []
+            try:
+                for line in produce():
+                    chunk.append(line)
+                    if len(chunk) >= STREAM_CHUNK_LINES:
+                        self.stream_queue.put((generation, chunk))
+                        chunk = []
+            except Exception as e:
+                chunk.append(f"显示异常：{str(e)}")
+            self.stream_queue.put((generation, chunk))
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        self.stream_threads.append(thread)
+        if not self.polling:
+            self.polling = True
+            self.after(STREAM_POLL_MS, self.poll_stream)
+
+    # 每 STREAM_POLL_MS 毫秒取一批结果显示；所有后台线程都已结束且队列已取空时停止轮询。
+    # 先检查线程再取队列：检查时已结束的线程的结果都已放入队列，队列取空后不会再有新结果
+    def poll_stream(self):
+        self.stream_threads = [thread for thread in self.stream_threads if thread.is_alive()]
+        batch = []
+        drained = False
+        for _ in range(STREAM_CHUNKS_PER_POLL):
+            try:
+                generation, chunk = self.stream_queue.get_nowait()
+            except queue.Empty:
+                drained = True
+                break
+            if generation == self.stream_generation:
+                batch.extend(chunk)
+        if batch:
+            if self.lines and self.lines[-1] == "":
+                self.lines.pop()
+            self.append_lines(batch + [""])
+        if drained and not self.stream_threads:
+            self.polling = False
+            return
+        self.after(STREAM_POLL_MS, self.poll_stream)
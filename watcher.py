@@ -0,0 +1,167 @@
+import asyncio
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from diagnostics import Diagnostics
+from main import Parser, lexical_analysis, read_word_category
+from semantic_analysis import SemanticAnalyzer
+
+# inotify 事件掩码：写入完成、移入（编辑器先写临时文件再重命名）、新建
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0x00000800
+inotify_event_header = struct.Struct('iIII')
+
+# 对一个试卷源文件依次运行词法、语法、语义检查，返回全部错误
+def check_file(filename, word_category):
+    try:
+        diagnostics = Diagnostics()
+        questions, tokens, errors = lexical_analysis(filename, diagnostics)
+        parser = Parser(tokens, word_category, os.devnull, diagnostics=diagnostics)
+        parser.parse()
+        errors = errors + parser.errors
+        sem_analyzer = SemanticAnalyzer([(token[0], token[1], line) for line, token in enumerate(tokens, start=1)], word_category, diagnostics)
+        sem_analyzer.analyze_auto()
+        return errors + sem_analyzer.errors
+    except Exception as e:
+        return [f"分析异常：{str(e)}"]
+
+def file_hash(filename):
+    with open(filename, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+# 在终端输出与上一次检查相比新增和消失的错误
+def print_error_diff(added, removed, errors):
+    for error in removed:
+        print(f"- {error}")
+    for error in added:
+        print(f"+ {error}")
+    print(f"共 {len(errors)} 个错误" if errors else "检查通过，无错误")
+
+# 监视试卷源文件，保存后自动重新检查。Linux 下使用 inotify，否则定时轮询文件的修改时间。
+# 连续保存在 debounce 秒内只检查一次，文件内容未变化时跳过检查
+class SourceWatcher:
+    def __init__(self, filename, on_result=print_error_diff, debounce=0.03, poll_interval=0.2,
+                 word_category_file='word_category.json'):
+        self.filename = os.path.abspath(filename)
+        self.on_result = on_result
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.word_category = read_word_category(word_category_file)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.last_hash = None
+        self.last_errors = []
+        self.pending = None
+        self.loop = None
+        self.stopped = None
+        self.stop_requested = False
+
+    async def check(self):
+        loop = asyncio.get_running_loop()
+        try:
+            content_hash = await loop.run_in_executor(self.executor, file_hash, self.filename)
+        except OSError:
+            return
+        if content_hash == self.last_hash:
+            return
+        self.last_hash = content_hash
+        errors = await loop.run_in_executor(self.executor, check_file, self.filename, self.word_category)
+        added = [error for error in errors if error not in self.last_errors]
+        removed = [error for error in self.last_errors if error not in errors]
+        self.last_errors = errors
+        self.on_result(added, removed, errors)
+
+    # 收到变更通知后延迟 debounce 秒再检查，期间的新通知会重新计时
+    def schedule_check(self):
+        if self.pending is not None:
+            self.pending.cancel()
+        loop = asyncio.get_running_loop()
+        self.pending = loop.call_later(self.debounce, lambda: loop.create_task(self.check()))
+
+    def watch_inotify(self):
+        libc_name = ctypes.util.find_library('c')
+        if sys.platform != 'linux' or not libc_name:
+            return None
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK)
+        if fd < 0:
+            return None
+        directory = os.path.dirname(self.filename).encode()
+        if libc.inotify_add_watch(fd, directory, IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+            os.close(fd)
+            return None
+        basename = os.path.basename(self.filename).encode()
+
+        def on_readable():
+            try:
+                data = os.read(fd, 4096)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                _, _, _, name_length = inotify_event_header.unpack_from(data, offset)
+                offset += inotify_event_header.size
+                name = data[offset:offset + name_length].rstrip(b'\0')
+                offset += name_length
+                if name == basename:
+                    self.schedule_check()
+
+        asyncio.get_running_loop().add_reader(fd, on_readable)
+        return fd
+
+    async def poll(self):
+        last_stat = None
+        while True:
+            try:
+                stat = os.stat(self.filename)
+                current_stat = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                current_stat = None
+            if current_stat != last_stat:
+                last_stat = current_stat
+                self.schedule_check()
+            await asyncio.sleep(self.poll_interval)
+
+    async def run(self):
+        # 先创建 stopped 再公开 self.loop：其他线程中的 stop() 看到 loop 时 stopped 一定已经存在
+        self.stopped = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        if self.stop_requested:
+            self.loop = None
+            return
+        fd = self.watch_inotify()
+        poll_task = asyncio.get_running_loop().create_task(self.poll()) if fd is None else None
+        await self.check()
+        try:
+            await self.stopped.wait()
+        finally:
+            self.loop = None
+            if fd is not None:
+                asyncio.get_running_loop().remove_reader(fd)
+                os.close(fd)
+            if poll_task is not None:
+                poll_task.cancel()
+            self.executor.shutdown(wait=False)
+
+    # 可以从其他线程调用
+    def stop(self):
+        self.stop_requested = True
+        loop = self.loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self.stopped.set)
+            except RuntimeError:  # run() 刚刚结束，事件循环已关闭
+                pass
+
+if __name__ == "__main__":
+    filename = sys.argv[1] if len(sys.argv) > 1 else "./src/examples.txt"
+    print(f"正在监视 {filename}，按 Ctrl+C 退出")
+    try:
+        asyncio.run(SourceWatcher(filename).run())
+    except KeyboardInterrupt:
+        pass